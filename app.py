@@ -1,16 +1,54 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, g, render_template, request, jsonify, session, redirect, stream_with_context, url_for
+import click
 from datetime import datetime, timedelta
+import base64
+import binascii
+import csv
+import io
+import json
+import hashlib
+import itertools
+import math
+import os
+import threading
+import time
 import uuid
 import random
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics import summarize
+from cache import ResultCache
+from events import EventBroker, format_event
+from logging_setup import configure_logging
+from metrics import CallbackGauge, Counter, Gauge, Histogram, Registry
+from profiling import ProfileBuffer, profile_dump, profile_text
+from records import decode_amount, decode_day, decode_id, encode_day, parse_date
+from rules import RuleBook
+from serialization import JSONProvider, gzip_body, parse_fields, select_fields
+from storage import Store
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.secret_key = 'expense_tracker_secret_key_change_in_production'
+app.config['DATABASE'] = os.environ.get(
+    'EXPENSE_TRACKER_DB', os.path.join(app.root_path, 'expense_tracker.db')
+)
 
 # Configure for deployment
 app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+app.config['LOG_LEVEL'] = os.environ.get('EXPENSE_TRACKER_LOG_LEVEL', 'WARNING')
+app.config['LOG_FORMAT'] = os.environ.get('EXPENSE_TRACKER_LOG_FORMAT', 'text')  # text or json
+
+logger = configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+auth_log = logger.getChild('auth')
+expenses_log = logger.getChild('expenses')
+stats_log = logger.getChild('stats')
+analytics_log = logger.getChild('analytics')
+generation_log = logger.getChild('generation')
+
 # Add error handlers
 @app.errorhandler(404)
 def not_found_error(error):
@@ -22,32 +60,140 @@ def internal_error(error):
 
 @app.errorhandler(Exception)
 def handle_exception(e):
-    print(f"Unhandled exception: {str(e)}")
+    logger.exception("Unhandled exception: %s", e)
     return jsonify({'error': 'An unexpected error occurred'}), 500
 
-# In-memory storage
-users = {}
-expenses = {}
-past_month_data = {}
+app.config['VERIFY_AGGREGATES'] = os.environ.get('EXPENSE_TRACKER_VERIFY_AGGREGATES') == '1'
+app.config['ANALYTICS_ENGINE'] = os.environ.get('EXPENSE_TRACKER_ANALYTICS_ENGINE', 'auto')  # auto, numpy or python
+app.config['RESPONSE_CACHE_BYTES'] = int(os.environ.get('EXPENSE_TRACKER_RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))
+app.config['GENERATION_WORKERS'] = int(os.environ.get('EXPENSE_TRACKER_GENERATION_WORKERS', 2))
+app.config['GENERATION_TIMEOUT'] = 30  # seconds a request waits for past month data
+app.config['SAVINGS_RULES'] = os.environ.get(
+    'EXPENSE_TRACKER_RULES', os.path.join(app.root_path, 'savings_rules.json')
+)
+# Responses at least this large are gzipped for clients that accept it
+app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('EXPENSE_TRACKER_COMPRESS_MIN_BYTES', 1024))
+# With profiling on, requests sent with an X-Profile header run under cProfile
+app.config['PROFILING'] = os.environ.get('EXPENSE_TRACKER_PROFILING') == '1'
+app.config['PROFILE_BUFFER_SIZE'] = int(os.environ.get('EXPENSE_TRACKER_PROFILE_BUFFER_SIZE', 20))
+# Live update streams: messages queued per stream before the oldest are
+# dropped, open streams allowed per user, and seconds between keep-alives
+app.config['EVENT_QUEUE_SIZE'] = int(os.environ.get('EXPENSE_TRACKER_EVENT_QUEUE_SIZE', 100))
+app.config['EVENT_STREAMS_PER_USER'] = int(os.environ.get('EXPENSE_TRACKER_EVENT_STREAMS_PER_USER', 8))
+app.config['EVENT_HEARTBEAT_SECONDS'] = 15
+
+# Serialised responses, keyed by ETag
+response_cache = ResultCache(app.config['RESPONSE_CACHE_BYTES'])
+
+# Change events pushed to each user's open /api/events streams
+event_broker = EventBroker(app.json.dumps, app.config['EVENT_QUEUE_SIZE'], app.config['EVENT_STREAMS_PER_USER'])
+
+# Synthetic past month data is generated off the request path, at most once
+# at a time per user
+generation_pool = ThreadPoolExecutor(max_workers=app.config['GENERATION_WORKERS'],
+                                     thread_name_prefix='past-month-data')
+generation_lock = threading.Lock()
+generation_futures = {}
+
+# Unnecessary-expense and recommendation rules, reloaded when the file is edited
+savings_rules = RuleBook(app.config['SAVINGS_RULES'])
+
 categories = [
     'Food & Dining', 'Transportation', 'Shopping', 'Entertainment', 
     'Bills & Utilities', 'Healthcare', 'Education', 'Travel', 'Other'
 ]
 
+# Durable storage for users, current expenses and past month data
+store = Store(app.config['DATABASE'], verify_totals=app.config['VERIFY_AGGREGATES'],
+              categories=categories)
+
+@app.teardown_appcontext
+def release_connection(exception):
+    store.release()
+
+# Request and store metrics, scraped from /metrics
+metrics = Registry()
+request_latency = metrics.register(Histogram(
+    'expense_tracker_request_duration_seconds', 'Request latency by endpoint', ('endpoint', 'method')))
+request_statuses = metrics.register(Counter(
+    'expense_tracker_requests_total', 'Responses by endpoint and status code', ('endpoint', 'method', 'status')))
+requests_in_flight = metrics.register(Gauge(
+    'expense_tracker_requests_in_flight', 'Requests currently being handled'))
+metrics.register(CallbackGauge(
+    'expense_tracker_store_rows', 'Rows held in each store table', store.sizes, ('table',)))
+metrics.register(CallbackGauge(
+    'expense_tracker_response_cache_bytes', 'Bytes of serialised responses held in the cache',
+    lambda: {(): response_cache.size}))
+metrics.register(CallbackGauge(
+    'expense_tracker_event_streams', 'Open /api/events streams',
+    lambda: {(): event_broker.stream_count()}))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    requests_in_flight.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Unmatched URLs share one label so scanners can't blow up the series count
+        endpoint = request.endpoint or 'unmatched'
+        request_latency.observe(time.perf_counter() - started, endpoint, request.method)
+        request_statuses.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request_timer(exception):
+    if g.pop('request_started', None) is not None:
+        requests_in_flight.dec()
+
+# The most recent request profiles, listed and downloaded via /api/debug/profiles
+profiles = ProfileBuffer(app.config['PROFILE_BUFFER_SIZE'])
+
+@app.before_request
+def start_profiler():
+    if app.config['PROFILING'] and request.headers.get('X-Profile'):
+        g.profiler = profiles.start()
+
+@app.after_request
+def stop_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profile_id = profiles.stop(
+            profiler,
+            endpoint=request.endpoint,
+            method=request.method,
+            path=request.full_path.rstrip('?'),
+            status=response.status_code,
+        )
+        response.headers['X-Profile-Id'] = str(profile_id)
+    return response
+
+@app.teardown_request
+def cancel_profiler(exception):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiles.cancel(profiler)
+
+
 # Initialize sample past month data for all users
 def init_sample_data():
     """Initialize sample past month data for demonstration"""
-    # Sample user for demo purposes
-    users['demo@example.com'] = {
+    # Sample user for demo purposes (only seeded into a fresh database)
+    created = store.create_user({
         'id': 'demo_user',
         'email': 'demo@example.com',
         'password': 'demo123',
         'name': 'Demo User',
         'monthly_budget': 60000
-    }
+    })
+    if not created:
+        store.release()
+        return
     
     # Initialize current expenses for demo user (for dashboard)
-    expenses['demo_user'] = [
+    store.add_expenses('demo_user', [
         {
             'id': str(uuid.uuid4()),
             'title': 'Grocery Shopping',
@@ -104,71 +250,79 @@ def init_sample_data():
             'date': (datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d'),
             'description': 'Monthly gym subscription'
         }
-    ]
+    ])
     
     # Generate past month data for demo user
-    past_month_data['demo_user'] = generate_past_month_data('demo_user')
+    store.replace_past_expenses('demo_user', generate_past_month_data('demo_user'))
+    store.release()
+
+# Define expense patterns for realistic data
+PAST_MONTH_PATTERNS = {
+    # Daily essentials
+    'Food & Dining': {'items': ['Breakfast', 'Lunch', 'Dinner', 'Snacks', 'Coffee'], 'range': (50, 500)},
+    'Transportation': {'items': ['Metro', 'Auto', 'Uber', 'Petrol', 'Bus'], 'range': (20, 300)},
+    
+    # Weekly expenses
+    'Shopping': {'items': ['Groceries', 'Clothes', 'Electronics', 'Books', 'Household'], 'range': (200, 2000)},
+    'Entertainment': {'items': ['Movies', 'Games', 'Streaming', 'Events', 'Sports'], 'range': (100, 1000)},
+    
+    # Monthly bills
+    'Bills & Utilities': {'items': ['Electricity', 'Internet', 'Phone', 'Water', 'Gas'], 'range': (500, 3000)},
+    'Healthcare': {'items': ['Medicine', 'Doctor Visit', 'Gym', 'Supplements'], 'range': (200, 2000)},
+    'Education': {'items': ['Course Fee', 'Books', 'Online Learning', 'Certification'], 'range': (500, 5000)},
+    'Travel': {'items': ['Weekend Trip', 'Vacation', 'Flight', 'Hotel'], 'range': (1000, 8000)},
+    'Other': {'items': ['Gifts', 'Charity', 'Miscellaneous', 'Emergency'], 'range': (100, 2000)}
+}
+for _category, _pattern in PAST_MONTH_PATTERNS.items():
+    _pattern['description'] = f'Past month expense - {_category.lower()}'
 
-def generate_past_month_data(user_id):
-    """Generate realistic past month expense data totaling ₹50,000"""
+# Realistic category distribution, as cumulative weights in `categories` order
+PAST_MONTH_CUM_WEIGHTS = list(itertools.accumulate([0.25, 0.15, 0.15, 0.10, 0.10, 0.08, 0.07, 0.05, 0.05]))
+
+def random_uuid4(rng):
+    """A version 4 UUID string drawn from ``rng``, so seeded runs repeat exactly"""
+    value = rng.getrandbits(128) & ~(0xf000 << 64) | (0x4000 << 64)  # version 4
+    value = value & ~(0xc000 << 48) | (0x8000 << 48)  # RFC 4122 variant
+    return decode_id(value.to_bytes(16, 'big'))
+
+def generate_past_month_data(user_id, rng=None, base_date=None):
+    """Generate realistic past month expense data totaling ₹50,000
+
+    Pass a seeded ``random.Random`` as ``rng`` for a reproducible dataset,
+    and ``base_date`` to generate the 30 days starting there instead of the
+    past 30 days.
+    """
     try:
+        rng = rng or random
         past_expenses = []
-        base_date = datetime.now() - timedelta(days=30)
-        
-        # Define expense patterns for realistic data
-        expense_patterns = [
-            # Daily essentials
-            {'category': 'Food & Dining', 'items': ['Breakfast', 'Lunch', 'Dinner', 'Snacks', 'Coffee'], 'range': (50, 500)},
-            {'category': 'Transportation', 'items': ['Metro', 'Auto', 'Uber', 'Petrol', 'Bus'], 'range': (20, 300)},
-            
-            # Weekly expenses
-            {'category': 'Shopping', 'items': ['Groceries', 'Clothes', 'Electronics', 'Books', 'Household'], 'range': (200, 2000)},
-            {'category': 'Entertainment', 'items': ['Movies', 'Games', 'Streaming', 'Events', 'Sports'], 'range': (100, 1000)},
-            
-            # Monthly bills
-            {'category': 'Bills & Utilities', 'items': ['Electricity', 'Internet', 'Phone', 'Water', 'Gas'], 'range': (500, 3000)},
-            {'category': 'Healthcare', 'items': ['Medicine', 'Doctor Visit', 'Gym', 'Supplements'], 'range': (200, 2000)},
-            {'category': 'Education', 'items': ['Course Fee', 'Books', 'Online Learning', 'Certification'], 'range': (500, 5000)},
-            {'category': 'Travel', 'items': ['Weekend Trip', 'Vacation', 'Flight', 'Hotel'], 'range': (1000, 8000)},
-            {'category': 'Other', 'items': ['Gifts', 'Charity', 'Miscellaneous', 'Emergency'], 'range': (100, 2000)}
-        ]
+        base_date = base_date or datetime.now() - timedelta(days=30)
+        first_day = base_date.toordinal()
+        dates = [decode_day(first_day + days_ago) for days_ago in range(30)]
         
         total_spent = 0
         target_total = 50000
         
-        # Generate 60-80 transactions over 30 days
-        num_transactions = random.randint(60, 80)
+        # Generate 60-80 transactions over 30 days, drawing random inputs in batches
+        num_transactions = rng.randint(60, 80)
+        chosen_categories = rng.choices(categories, cum_weights=PAST_MONTH_CUM_WEIGHTS, k=num_transactions)
         
-        for i in range(num_transactions):
+        for i, category in enumerate(chosen_categories):
             try:
-                # Random date in past 30 days
-                days_ago = random.randint(0, 29)
-                expense_date = base_date + timedelta(days=days_ago)
-                
-                # Choose category based on realistic distribution
-                category_weights = [0.25, 0.15, 0.15, 0.10, 0.10, 0.08, 0.07, 0.05, 0.05]
-                category = random.choices(categories, weights=category_weights)[0]
-                
-                # Find pattern for category
-                pattern = next((p for p in expense_patterns if p['category'] == category), expense_patterns[0])
+                pattern = PAST_MONTH_PATTERNS.get(category, PAST_MONTH_PATTERNS['Food & Dining'])
                 
                 # Calculate amount (adjust to reach target total)
                 remaining_transactions = num_transactions - i
                 remaining_amount = target_total - total_spent
+                avg_remaining = remaining_amount / remaining_transactions
+                min_amt, max_amt = pattern['range']
                 
-                if remaining_transactions > 0:
-                    avg_remaining = remaining_amount / remaining_transactions
-                    min_amt, max_amt = pattern['range']
-                    
-                    # Adjust range based on remaining budget
-                    if avg_remaining > max_amt:
-                        amount = random.randint(max_amt, min(int(avg_remaining * 1.5), max_amt * 2))
-                    elif avg_remaining < min_amt:
-                        amount = random.randint(min(min_amt, max(1, remaining_amount)), max(1, remaining_amount))
-                    else:
-                        amount = random.randint(min_amt, max_amt)
+                # Adjust range based on remaining budget
+                if avg_remaining > max_amt:
+                    amount = rng.randint(max_amt, min(int(avg_remaining * 1.5), max_amt * 2))
+                elif avg_remaining < min_amt:
+                    amount = rng.randint(min(min_amt, max(1, remaining_amount)), max(1, remaining_amount))
                 else:
-                    amount = remaining_amount
+                    amount = rng.randint(min_amt, max_amt)
                 
                 # Ensure we don't exceed target and amount is positive
                 if total_spent + amount > target_total:
@@ -178,12 +332,12 @@ def generate_past_month_data(user_id):
                     continue
                     
                 expense = {
-                    'id': str(uuid.uuid4()),
-                    'title': random.choice(pattern['items']),
+                    'id': random_uuid4(rng),
+                    'title': rng.choice(pattern['items']),
                     'amount': amount,
                     'category': category,
-                    'date': expense_date.strftime('%Y-%m-%d'),
-                    'description': f'Past month expense - {category.lower()}'
+                    'date': dates[rng.randint(0, 29)],
+                    'description': pattern['description']
                 }
                 
                 past_expenses.append(expense)
@@ -193,7 +347,7 @@ def generate_past_month_data(user_id):
                     break
                     
             except Exception as e:
-                print(f"Error generating expense {i}: {str(e)}")
+                generation_log.warning("Error generating expense %d: %s", i, e)
                 continue
         
         # Sort by date
@@ -202,8 +356,365 @@ def generate_past_month_data(user_id):
         return past_expenses
         
     except Exception as e:
-        print(f"Error generating past month data for user {user_id}: {str(e)}")
-        return []  # Return empty lis
+        generation_log.exception("Error generating past month data for user %s: %s", user_id, e)
+        return []  # Return empty list
+
+# Users seeded per transaction: big enough to amortise each commit's WAL
+# checkpoint, small enough not to hold every writer lock for long
+SEED_CHUNK_USERS = 50
+
+@app.cli.command('seed-data')
+@click.option('--users', default=1000, show_default=True, help='Number of users to create.')
+@click.option('--months', default=12, show_default=True, help='Months of expense history per user.')
+@click.option('--seed', default=0, show_default=True, help='Random seed; the same seed gives the same data.')
+def seed_data(users, months, seed):
+    """Fill the store with synthetic users and expense history for load testing."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    start = time.perf_counter()
+    created_users = rows = 0
+    for first in range(0, users, SEED_CHUNK_USERS):
+        chunk = [(i, random_uuid4(rng)) for i in range(first, min(first + SEED_CHUNK_USERS, users))]
+        # One commit per chunk of users, holding all their writer locks throughout
+        with store.transaction(*(user_id for _, user_id in chunk)):
+            for i, user_id in chunk:
+                created = store.create_user({
+                    'id': user_id,
+                    'email': f'seed{seed}-user{i}@example.com',
+                    'password': 'password',
+                    'name': f'Seed User {i}',
+                    'monthly_budget': 30000
+                })
+                if not created:
+                    continue
+                created_users += 1
+                history = []
+                for month in range(1, months + 1):
+                    history.extend(generate_past_month_data(user_id, rng, today - timedelta(days=30 * (month + 1))))
+                store.add_expenses(user_id, history)
+                past_data = generate_past_month_data(user_id, rng)
+                store.replace_past_expenses(user_id, past_data)
+                rows += len(history) + len(past_data)
+    click.echo(f'Seeded {created_users} users with {rows} expenses in {time.perf_counter() - start:.1f}s')
+
+# Expenses may be dated at most this many years either side of the current one
+MAX_EXPENSE_YEARS = 10
+
+def validate_expense(data):
+    """Build a normalised expense record from client data, raising ValueError if invalid"""
+    # Validate required fields
+    required_fields = ['title', 'amount', 'category']
+    for field in required_fields:
+        if field not in data or not data[field]:
+            raise ValueError(f'Missing required field: {field}')
+    
+    # Validate amount is a number
+    try:
+        amount = float(data['amount'])
+    except (ValueError, TypeError):
+        raise ValueError('Invalid amount format')
+    if not math.isfinite(amount):
+        raise ValueError('Invalid amount format')
+    if amount <= 0:
+        raise ValueError('Amount must be greater than 0')
+    
+    # Validate date format, exactly as storage parses it
+    date = data.get('date') or datetime.now().strftime('%Y-%m-%d')
+    try:
+        day = parse_date(date)
+    except ValueError:
+        raise ValueError('Invalid date format, expected YYYY-MM-DD')
+    if abs(day.year - datetime.now().year) > MAX_EXPENSE_YEARS:
+        raise ValueError(f'Date must be within {MAX_EXPENSE_YEARS} years of today')
+    
+    return {
+        'id': str(uuid.uuid4()),
+        'title': str(data['title']).strip(),
+        'amount': amount,
+        'category': str(data['category']).strip(),
+        'date': str(date),
+        'description': str(data.get('description') or '').strip()
+    }
+
+EXPENSE_PAGE_SIZE = 50
+MAX_EXPENSE_PAGE_SIZE = 500
+
+def encode_cursor(expense):
+    """Opaque pagination cursor pointing just past the given expense"""
+    raw = f"{expense['date']}|{expense['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    date, sep, expense_id = raw.partition('|')
+    if not sep:
+        raise ValueError('Invalid cursor')
+    return date, expense_id
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS = 100
+IMPORT_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+def import_format():
+    """'csv' or 'ndjson', from ?format= or the Content-Type, else None"""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt if fmt in ('csv', 'ndjson') else None
+    return IMPORT_FORMATS.get(request.mimetype)
+
+def iter_import_rows(stream, fmt):
+    """Yield (line number, row dict or error message) from an upload, one row at a time"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        missing = {'title', 'amount', 'category'} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}")
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, 'Invalid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, 'Expected a JSON object'
+            continue
+        yield line_number, row
+
+EXPORT_COLUMNS = ['id', 'title', 'amount', 'category', 'date', 'description', 'source']
+EXPORT_SOURCES = {
+    'current': [('current', False)],
+    'past': [('past_month', True)],
+    'all': [('current', False), ('past_month', True)],
+}
+
+def iter_export(user_id, fmt, sources, start, end, category):
+    """Yield an export body chunk by chunk, one store chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(EXPORT_COLUMNS)
+    for source, past in sources:
+        for chunk in store.iter_expenses(user_id, past, start, end, category):
+            for expense in chunk:
+                expense['source'] = source
+                if fmt == 'csv':
+                    writer.writerow([expense[column] for column in EXPORT_COLUMNS])
+                else:
+                    buffer.write(json.dumps(expense))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stats_delta(changes, sign=1):
+    """How /api/stats totals move when the (category, amount) ``changes`` are added, or removed with sign=-1"""
+    category_totals = {}
+    for category, amount in changes:
+        category_totals[category] = category_totals.get(category, 0) + sign * amount
+    return {
+        'total_spent': sum(category_totals.values()),
+        'expense_count': sign * len(changes),
+        'category_totals': category_totals
+    }
+
+def compute_stats(user_id):
+    """Dashboard statistics, served from the running expense totals"""
+    total_spent, expense_count, category_totals = store.expense_totals(user_id)
+    stats_log.debug("Found %d expenses for user %s", expense_count, user_id)
+    
+    # Find user data
+    user = store.get_user_by_id(user_id)
+    
+    if not user:
+        stats_log.warning("User %s not found in users database, using default profile", user_id)
+        # Create a default user to prevent errors
+        user = {
+            'id': user_id,
+            'monthly_budget': 30000,
+            'name': 'User',
+            'email': 'user@example.com'
+        }
+    
+    # Calculate statistics
+    budget = user.get('monthly_budget', 30000)
+    remaining = max(0, budget - total_spent)  # Ensure remaining is not negative
+    
+    stats_data = {
+        'total_spent': total_spent,
+        'budget': budget,
+        'remaining': remaining,
+        'budget_used_percentage': min(100, (total_spent / budget * 100)) if budget > 0 else 0,
+        'category_totals': category_totals,
+        'expense_count': expense_count
+    }
+    
+    stats_log.debug("Returning stats: %s", stats_data)
+    return stats_data
+
+# Changes touching more expenses than this are announced as one
+# expenses-changed event, telling clients to reload, instead of one each
+MAX_EVENT_EXPENSES = 50
+
+def publish_stats(user_id):
+    """Push the user's current stats, tagged with the data version they are at least as new as"""
+    version = store.data_version(user_id)
+    event_broker.publish(user_id, 'stats', dict(compute_stats(user_id), version=version))
+
+def publish_expense_changes(user_id, added=(), deleted=(), count=None):
+    """Push added expenses and deleted ids, then the updated stats, to the user's event streams.
+
+    ``count`` announces a bulk change whose expenses are not listed.
+    """
+    if not event_broker.has_subscribers(user_id):
+        return
+    if count is not None or len(added) + len(deleted) > MAX_EVENT_EXPENSES:
+        event_broker.publish(user_id, 'expenses-changed', {'count': len(added) + len(deleted) if count is None else count})
+    else:
+        for expense in added:
+            event_broker.publish(user_id, 'expense-added', expense)
+        for expense_id in deleted:
+            event_broker.publish(user_id, 'expense-deleted', {'id': expense_id})
+    publish_stats(user_id)
+
+def publish_past_month(user_id, past_data):
+    event_broker.publish(user_id, 'past-month-regenerated', {
+        'expense_count': len(past_data),
+        'total_amount': sum(expense['amount'] for expense in past_data)
+    })
+
+def ensure_past_month_data(user_id):
+    """Generate past month data for a user who has none yet"""
+    if store.has_past_expenses(user_id):
+        return
+    generation_log.info("Generating past month data for user: %s", user_id)
+    past_data = generate_past_month_data(user_id)
+    
+    # If still no data, fall back to a minimal sample
+    if not past_data:
+        generation_log.warning("No past data generated for user %s, creating minimal sample data", user_id)
+        past_data = [
+            {
+                'id': str(uuid.uuid4()),
+                'title': 'Sample Expense',
+                'amount': 50000,
+                'category': 'Other',
+                'date': (datetime.now() - timedelta(days=15)).strftime('%Y-%m-%d'),
+                'description': 'Sample past month data'
+            }
+        ]
+    store.replace_past_expenses(user_id, past_data)
+    publish_past_month(user_id, past_data)
+
+def schedule_past_month_data(user_id):
+    """Generate a user's past month data on the worker pool, returning its future.
+
+    Concurrent callers for the same user share one in-flight generation.
+    """
+    with generation_lock:
+        future = generation_futures.get(user_id)
+        if future is None:
+            future = generation_pool.submit(_generate_in_background, user_id)
+            generation_futures[user_id] = future
+        return future
+
+def _generate_in_background(user_id):
+    try:
+        ensure_past_month_data(user_id)
+    except Exception as e:
+        generation_log.exception("Error generating past month data for user %s: %s", user_id, e)
+        raise
+    finally:
+        store.release()
+        with generation_lock:
+            generation_futures.pop(user_id, None)
+
+def wait_for_past_month_data(user_id):
+    """Block until the user's past month data exists, joining any in-flight generation"""
+    if store.has_past_expenses(user_id):
+        return
+    schedule_past_month_data(user_id).result(timeout=app.config['GENERATION_TIMEOUT'])
+
+def version_etag(*parts):
+    """Strong ETag for a response determined entirely by ``parts``"""
+    return hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()
+
+GZIP_ETAG_SUFFIX = '-gzip'
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html'}
+
+def etag_matches(etag):
+    """Whether If-None-Match names ``etag`` in either its plain or gzip form"""
+    return request.if_none_match.contains(etag) or request.if_none_match.contains(etag + GZIP_ETAG_SUFFIX)
+
+def not_modified(etag):
+    response = app.response_class(status=304)
+    if request.if_none_match.contains(etag + GZIP_ETAG_SUFFIX):
+        etag += GZIP_ETAG_SUFFIX
+    response.set_etag(etag)
+    return response
+
+def requested_fields():
+    """The ?fields= sparse fieldset for expense records, or None for all fields"""
+    return parse_fields(request.args.get('fields'))
+
+@app.after_request
+def compress_response(response):
+    """Gzip large text bodies for clients that accept it, reusing cached compressed bodies"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.content_length is None
+            or response.content_length < app.config['COMPRESS_MIN_BYTES']):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+    etag, _ = response.get_etag()
+    key = f'gzip:{etag}' if etag else None
+    body = response_cache.get(key) if key else None
+    if body is None:
+        body = gzip_body(response.get_data())
+        if key:
+            response_cache.put(key, body)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = 'gzip'
+    if etag:
+        response.set_etag(etag + GZIP_ETAG_SUFFIX)
+    return response
+
+def cached_json(parts, build):
+    """Serve the JSON produced by ``build()``, keyed and tagged by ``parts``.
+
+    ``parts`` must include everything the body depends on (normally the
+    endpoint, user id and data version). A matching If-None-Match gets a 304
+    without building anything, and the serialised body is kept in the
+    response cache for the next request.
+    """
+    etag = version_etag(*parts)
+    if etag_matches(etag):
+        return not_modified(etag)
+    body = response_cache.get(etag)
+    if body is None:
+        body = app.json.dumps_bytes(build()) + b'\n'
+        response_cache.put(etag, body)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
 
 # Initialize sample data
 init_sample_data()
@@ -212,6 +723,7 @@ init_sample_data()
 def list_routes():
     """Debug endpoint to list all available routes"""
     try:
+        sizes = store.sizes()
         routes = []
         for rule in app.url_map.iter_rules():
             routes.append({
@@ -228,9 +740,9 @@ def list_routes():
                 'session_keys': list(session.keys())
             },
             'data_status': {
-                'users_count': len(users),
-                'expenses_users': list(expenses.keys()),
-                'past_month_users': list(past_month_data.keys())
+                'users_count': sizes['users'],
+                'expenses_count': sizes['expenses'],
+                'past_month_expenses_count': sizes['past_expenses']
             }
         })
     except Exception as e:
@@ -250,10 +762,39 @@ def debug_session():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/debug/profiles')
+def list_profiles():
+    """Captured request profiles, newest first"""
+    if not app.config['PROFILING']:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    return jsonify({'profiles': profiles.summaries()})
+
+@app.route('/api/debug/profiles/<int:profile_id>')
+def download_profile(profile_id):
+    """A captured profile as a pstats report, or ?format=pstats for the binary dump"""
+    if not app.config['PROFILING']:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    entry = profiles.get(profile_id)
+    if entry is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    if request.args.get('format') == 'pstats':
+        response = app.response_class(profile_dump(entry), mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = f'attachment; filename=profile-{profile_id}.prof'
+        return response
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls', 'ncalls'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    return app.response_class(profile_text(entry, sort), mimetype='text/plain')
+
 @app.route('/health')
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'ExpenseFlow is running'}), 200
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/debug/test-endpoints')
 def test_endpoints():
     """Test all API endpoints to ensure they're working"""
@@ -273,32 +814,28 @@ def test_endpoints():
             
             # Test expenses endpoint
             try:
-                user_expenses = expenses.get(user_id, [])
-                results['expenses'] = f'OK - {len(user_expenses)} expenses'
+                results['expenses'] = f'OK - {store.count_expenses(user_id)} expenses'
             except Exception as e:
                 results['expenses'] = f'ERROR: {str(e)}'
             
             # Test stats endpoint
             try:
-                user_expenses = expenses.get(user_id, [])
-                total_spent = sum(exp.get('amount', 0) for exp in user_expenses)
+                total_spent, _, _ = store.expense_totals(user_id)
                 results['stats'] = f'OK - Total spent: ₹{total_spent}'
             except Exception as e:
                 results['stats'] = f'ERROR: {str(e)}'
             
             # Test past month data
             try:
-                past_data = past_month_data.get(user_id, [])
-                if not past_data:
-                    past_month_data[user_id] = generate_past_month_data(user_id)
-                    past_data = past_month_data[user_id]
+                wait_for_past_month_data(user_id)
+                past_data = store.list_past_expenses(user_id)
                 results['past_month_data'] = f'OK - {len(past_data)} past expenses'
             except Exception as e:
                 results['past_month_data'] = f'ERROR: {str(e)}'
             
             # Test analytics summary
             try:
-                past_data = past_month_data.get(user_id, [])
+                past_data = store.list_past_expenses(user_id)
                 total = sum(exp.get('amount', 0) for exp in past_data)
                 results['analytics_summary'] = f'OK - Past month total: ₹{total}'
             except Exception as e:
@@ -325,7 +862,7 @@ def index():
             return redirect(url_for('login'))
         return render_template('dashboard.html')
     except Exception as e:
-        print(f"Error in index route: {str(e)}")
+        logger.exception("Error in index route: %s", e)
         return redirect(url_for('login'))
 
 @app.route('/login')
@@ -339,15 +876,16 @@ def api_login():
         email = data.get('email')
         password = data.get('password')
         
-        if email in users and users[email]['password'] == password:
-            user_id = users[email]['id']
+        user = store.get_user_by_email(email)
+        if user and user['password'] == password:
+            user_id = user['id']
             session['user_id'] = user_id
-            session['user_name'] = users[email]['name']
+            session['user_name'] = user['name']
             
             # Ensure current expenses exist for dashboard
-            if user_id not in expenses or not expenses[user_id]:
-                print(f"Creating sample expenses for dashboard: {user_id}")
-                expenses[user_id] = [
+            if not store.count_expenses(user_id):
+                auth_log.info("Creating sample expenses for dashboard: %s", user_id)
+                store.add_expenses(user_id, [
                     {
                         'id': str(uuid.uuid4()),
                         'title': 'Grocery Shopping',
@@ -388,19 +926,17 @@ def api_login():
                         'date': (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d'),
                         'description': 'Monthly electricity bill'
                     }
-                ]
+                ])
             
-            # Ensure past month data exists for analytics (don't change this)
-            if user_id not in past_month_data:
-                print(f"Generating past month data for existing user: {user_id}")
-                past_month_data[user_id] = generate_past_month_data(user_id)
+            # Ensure past month data exists for analytics (generated in the background)
+            schedule_past_month_data(user_id)
             
             return jsonify({'success': True, 'message': 'Login successful'})
         
         return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
         
     except Exception as e:
-        print(f"Error in login: {str(e)}")
+        auth_log.exception("Error in login: %s", e)
         return jsonify({'success': False, 'message': 'Login failed'}), 500
 
 @app.route('/api/register', methods=['POST'])
@@ -412,20 +948,30 @@ def api_register():
         name = data.get('name')
         budget = data.get('budget', 30000)
         
-        if email in users:
-            return jsonify({'success': False, 'message': 'Email already exists'}), 400
+        for field, value in (('email', email), ('password', password), ('name', name)):
+            if not isinstance(value, str) or not value.strip():
+                return jsonify({'success': False, 'message': f'Missing required field: {field}'}), 400
+        try:
+            budget = float(budget)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Invalid budget'}), 400
+        if not math.isfinite(budget) or budget <= 0:
+            return jsonify({'success': False, 'message': 'Invalid budget'}), 400
+        budget = decode_amount(budget)
         
         user_id = str(uuid.uuid4())
-        users[email] = {
+        created = store.create_user({
             'id': user_id,
             'email': email,
             'password': password,
             'name': name,
             'monthly_budget': budget
-        }
+        })
+        if not created:
+            return jsonify({'success': False, 'message': 'Email already exists'}), 400
         
         # Add sample expenses for dashboard display
-        expenses[user_id] = [
+        store.add_expenses(user_id, [
             {
                 'id': str(uuid.uuid4()),
                 'title': 'Grocery Shopping',
@@ -466,17 +1012,17 @@ def api_register():
                 'date': (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d'),
                 'description': 'Monthly electricity bill'
             }
-        ]
+        ])
         
-        # Generate past month data for analytics (don't change this)
-        past_month_data[user_id] = generate_past_month_data(user_id)
+        # Generate past month data for analytics (in the background)
+        schedule_past_month_data(user_id)
         
         session['user_id'] = user_id
         session['user_name'] = name
         return jsonify({'success': True, 'message': 'Registration successful'})
         
     except Exception as e:
-        print(f"Error in registration: {str(e)}")
+        auth_log.exception("Error in registration: %s", e)
         return jsonify({'success': False, 'message': 'Registration failed'}), 500
 
 @app.route('/api/logout', methods=['POST'])
@@ -487,47 +1033,40 @@ def api_logout():
 @app.route('/api/expenses')
 def get_expenses():
     try:
-        print("Expenses endpoint called")  # Debug log
-        
         if 'user_id' not in session:
-            print("User not authenticated for expenses")
             return jsonify({'error': 'Not authenticated'}), 401
         
         user_id = session['user_id']
-        print(f"Getting expenses for user: {user_id}")
-        
-        # Ensure user exists in expenses dict
-        if user_id not in expenses:
-            expenses[user_id] = []
-            print(f"Initialized empty expenses for user: {user_id}")
-        
-        user_expenses = expenses.get(user_id, [])
-        print(f"Found {len(user_expenses)} expenses")
-        
-        # Ensure all expenses have required fields
-        valid_expenses = []
-        for exp in user_expenses:
-            if isinstance(exp, dict) and 'id' in exp and 'amount' in exp:
-                # Ensure all required fields exist with defaults
-                valid_exp = {
-                    'id': exp.get('id', str(uuid.uuid4())),
-                    'title': exp.get('title', 'Expense'),
-                    'amount': exp.get('amount', 0),
-                    'category': exp.get('category', 'Other'),
-                    'date': exp.get('date', datetime.now().strftime('%Y-%m-%d')),
-                    'description': exp.get('description', '')
-                }
-                valid_expenses.append(valid_exp)
-        
-        # Update the stored expenses with validated data
-        expenses[user_id] = valid_expenses
+        expenses_log.debug("Getting expenses for user: %s", user_id)
+        
+        # Expenses are validated when written, so stored rows go out as-is
+        limit = request.args.get('limit', type=int)
+        after = request.args.get('after')
+        fields = requested_fields()
+        version = store.data_version(user_id)
+        if limit is None and after is None:
+            return cached_json(('expenses', user_id, version, fields),
+                               lambda: store.list_expenses(user_id).to_dicts(fields))
+        
+        # Cursor pagination, newest first
+        limit = max(1, min(limit or EXPENSE_PAGE_SIZE, MAX_EXPENSE_PAGE_SIZE))
+        etag = version_etag('expenses-page', user_id, version, limit, after, fields)
+        if etag_matches(etag):
+            return not_modified(etag)
+        try:
+            position = decode_cursor(after) if after else None
+            page = store.list_expenses_page(user_id, limit + 1, position)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
         
-        return jsonify(valid_expenses)
+        response = jsonify(select_fields(page[:limit], fields))
+        response.set_etag(etag)
+        if len(page) > limit:
+            response.headers['X-Next-Cursor'] = encode_cursor(page[limit - 1])
+        return response
         
     except Exception as e:
-        print(f"Error getting expenses: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        expenses_log.exception("Error getting expenses: %s", e)
         
         # Return empty array to prevent frontend errors
         return jsonify([])
@@ -544,115 +1083,374 @@ def add_expense():
         
         user_id = session['user_id']
         
-        # Validate required fields
-        required_fields = ['title', 'amount', 'category']
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-        
-        # Validate amount is a number
         try:
-            amount = float(data['amount'])
-            if amount <= 0:
-                return jsonify({'error': 'Amount must be greater than 0'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'error': 'Invalid amount format'}), 400
-        
-        expense = {
-            'id': str(uuid.uuid4()),
-            'title': str(data['title']).strip(),
-            'amount': amount,
-            'category': str(data['category']).strip(),
-            'date': data.get('date', datetime.now().strftime('%Y-%m-%d')),
-            'description': str(data.get('description', '')).strip()
-        }
+            expense = validate_expense(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if user_id not in expenses:
-            expenses[user_id] = []
-        
-        expenses[user_id].append(expense)
-        return jsonify(expense)
+        store.add_expense(user_id, expense)
+        publish_expense_changes(user_id, added=[expense])
+        return jsonify(dict(expense, stats_delta=stats_delta([(expense['category'], expense['amount'])])))
         
     except Exception as e:
-        print(f"Error adding expense: {str(e)}")  # For debugging
+        expenses_log.exception("Error adding expense: %s", e)
         return jsonify({'error': 'Failed to add expense'}), 500
 
+@app.route('/api/expenses/import', methods=['POST'])
+def import_expenses():
+    """Bulk-add expenses from a CSV (with a header row) or NDJSON upload.
+
+    The body is parsed as it streams in and valid rows are stored in
+    batches, so memory stays flat however large the upload is. Each row is
+    validated like add_expense; invalid rows are reported by line number
+    and skipped without affecting the others.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    fmt = import_format()
+    if fmt is None:
+        return jsonify({'error': 'Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson'}), 415
+
+    user_id = session['user_id']
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    def reject(line_number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({'line': line_number, 'error': message})
+
+    rows = iter_import_rows(request.stream, fmt)
+    parse_error = None
+    while True:
+        try:
+            line_number, row = next(rows)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            # Unreadable upload (bad header, encoding or CSV quoting); the rows before it are kept
+            parse_error = str(e)
+            break
+        if isinstance(row, str):
+            reject(line_number, row)
+            continue
+        try:
+            batch.append(validate_expense(row))
+        except ValueError as e:
+            reject(line_number, str(e))
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            store.add_expenses(user_id, batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        store.add_expenses(user_id, batch)
+        imported += len(batch)
+    if imported:
+        publish_expense_changes(user_id, count=imported)
+    if parse_error is not None:
+        return jsonify({'error': parse_error, 'imported': imported, 'failed': failed, 'errors': errors}), 400
+
+    expenses_log.info("Imported %d expenses for user %s (%d rejected)", imported, user_id, failed)
+    return jsonify({
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors)
+    })
+
+@app.route('/api/expenses/export')
+def export_expenses():
+    """Stream a user's expenses as CSV or NDJSON, oldest first.
+
+    Query parameters: format (csv or ndjson), source (current, past or all),
+    from and to (inclusive YYYY-MM-DD) and category. Rows are read and
+    written a chunk at a time, so memory stays flat for any history size.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Invalid format, expected csv or ndjson'}), 400
+    sources = EXPORT_SOURCES.get(request.args.get('source', 'all'))
+    if sources is None:
+        return jsonify({'error': 'Invalid source, expected current, past or all'}), 400
+    start = request.args.get('from')
+    end = request.args.get('to')
+    try:
+        for bound in (start, end):
+            if bound is not None:
+                encode_day(bound)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    category = request.args.get('category')
+
+    body = iter_export(session['user_id'], fmt, sources, start, end, category)
+    response = app.response_class(
+        stream_with_context(body),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=expenses.{fmt}'
+    return response
+
+@app.route('/api/expenses/search')
+def search_expenses():
+    """Expenses whose title or description has a word starting with each word of ?q=, newest first"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    user_id = session['user_id']
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+    limit = max(1, min(request.args.get('limit', EXPENSE_PAGE_SIZE, type=int), MAX_EXPENSE_PAGE_SIZE))
+    after = request.args.get('after')
+    fields = requested_fields()
+
+    version = store.data_version(user_id)
+    etag = version_etag('expenses-search', user_id, version, query, limit, after, fields)
+    if etag_matches(etag):
+        return not_modified(etag)
+    try:
+        position = decode_cursor(after) if after else None
+        page = store.search_expenses(user_id, query, limit + 1, position)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    response = jsonify(select_fields(page[:limit], fields))
+    response.set_etag(etag)
+    if len(page) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(page[limit - 1])
+    return response
+
+@app.route('/api/expenses/query')
+def query_expenses():
+    """Expenses matching every given filter, newest first.
+
+    Query parameters: category (repeatable), min_amount and max_amount
+    (inclusive), from and to (inclusive YYYY-MM-DD) or period
+    (week, month, quarter or year), plus limit, after and fields as for
+    /api/expenses.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    user_id = session['user_id']
+    categories = request.args.getlist('category') or None
+    bounds = []
+    for name in ('min_amount', 'max_amount'):
+        value = request.args.get(name)
+        try:
+            bound = None if value is None else float(value)
+        except ValueError:
+            return jsonify({'error': f'Invalid {name}'}), 400
+        if bound is not None and not math.isfinite(bound):
+            return jsonify({'error': f'Invalid {name}'}), 400
+        bounds.append(bound)
+    min_amount, max_amount = bounds
+    start = request.args.get('from')
+    end = request.args.get('to')
+    period = request.args.get('period')
+    if period:
+        try:
+            start, end = (day.isoformat() for day in period_bounds(period, datetime.now().date()))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    try:
+        for bound in (start, end):
+            if bound is not None:
+                encode_day(bound)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    limit = max(1, min(request.args.get('limit', EXPENSE_PAGE_SIZE, type=int), MAX_EXPENSE_PAGE_SIZE))
+    after = request.args.get('after')
+    fields = requested_fields()
+
+    version = store.data_version(user_id)
+    etag = version_etag('expenses-query', user_id, version, sorted(categories or ()), categories is None,
+                        min_amount, max_amount, start, end, limit, after, fields)
+    if etag_matches(etag):
+        return not_modified(etag)
+    try:
+        position = decode_cursor(after) if after else None
+        page = store.query_expenses(user_id, limit + 1, categories, min_amount, max_amount, start, end, position)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    response = jsonify(select_fields(page[:limit], fields))
+    response.set_etag(etag)
+    if len(page) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(page[limit - 1])
+    return response
+
 @app.route('/api/expenses/<expense_id>', methods=['DELETE'])
 def delete_expense(expense_id):
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
     user_id = session['user_id']
-    user_expenses = expenses.get(user_id, [])
-    
-    expenses[user_id] = [exp for exp in user_expenses if exp['id'] != expense_id]
-    return jsonify({'success': True})
+    removed = store.delete_expense(user_id, expense_id)
+    if removed is None:
+        return jsonify({'error': 'Expense not found'}), 404
+    publish_expense_changes(user_id, deleted=[expense_id])
+    return jsonify({'success': True, 'stats_delta': stats_delta([removed], sign=-1)})
+
+MAX_BATCH_ITEMS = 1000
+
+class BatchRejected(Exception):
+    """Raised inside a batch transaction to roll the whole batch back"""
+
+@app.route('/api/expenses/batch', methods=['POST'])
+def batch_expenses():
+    """Create and delete several expenses in one all-or-nothing request.
+
+    Body: {"create": [expense, ...], "delete": [expense id, ...]}. Every item
+    gets a result in the same order. If any item fails nothing is applied;
+    otherwise the response also carries the updated stats.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
+    creates = data.get('create') or []
+    deletes = data.get('delete') or []
+    if not isinstance(creates, list) or not isinstance(deletes, list):
+        return jsonify({'error': 'create and delete must be lists'}), 400
+    if len(creates) + len(deletes) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'At most {MAX_BATCH_ITEMS} items per batch'}), 400
+
+    user_id = session['user_id']
+    expenses = []
+    create_results = []
+    for item in creates:
+        try:
+            expense = validate_expense(item if isinstance(item, dict) else {})
+        except ValueError as e:
+            create_results.append({'success': False, 'error': str(e)})
+            continue
+        expenses.append(expense)
+        create_results.append({'success': True, 'expense': expense})
+    if len(expenses) < len(creates):
+        return jsonify({
+            'error': 'Batch rejected, nothing was applied',
+            'create': create_results,
+            'delete': [{'id': expense_id, 'success': False, 'error': 'Not attempted'} for expense_id in deletes]
+        }), 400
+
+    delete_results = []
+    try:
+        with store.transaction(user_id):
+            if expenses:
+                store.add_expenses(user_id, expenses)
+            found = store.delete_expenses(user_id, [str(expense_id) for expense_id in deletes])
+            delete_results = [
+                {'id': expense_id, 'success': True} if removed is not None
+                else {'id': expense_id, 'success': False, 'error': 'Expense not found'}
+                for expense_id, removed in zip(deletes, found)
+            ]
+            if None in found:
+                raise BatchRejected()
+    except BatchRejected:
+        for result in create_results + delete_results:
+            if result['success']:
+                result['success'] = False
+                result['error'] = 'Rolled back'
+                result.pop('expense', None)
+        return jsonify({
+            'error': 'Batch rejected, nothing was applied',
+            'create': create_results,
+            'delete': delete_results
+        }), 404
+
+    publish_expense_changes(user_id, added=expenses, deleted=[str(expense_id) for expense_id in deletes])
+    return jsonify({
+        'create': create_results,
+        'delete': delete_results,
+        'stats': compute_stats(user_id)
+    })
+
+@app.route('/api/dashboard')
+def get_dashboard():
+    """Everything the dashboard needs on load: categories, the newest expenses and stats"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    user_id = session['user_id']
+
+    fields = requested_fields()
+
+    def build():
+        page = store.list_expenses_page(user_id, EXPENSE_PAGE_SIZE + 1)
+        return {
+            'categories': categories,
+            'expenses': select_fields(page[:EXPENSE_PAGE_SIZE], fields),
+            'next_cursor': encode_cursor(page[EXPENSE_PAGE_SIZE - 1]) if len(page) > EXPENSE_PAGE_SIZE else None,
+            'stats': compute_stats(user_id)
+        }
+
+    version = store.data_version(user_id)
+    return cached_json(('dashboard', user_id, version, fields), build)
+
+@app.route('/api/events')
+def stream_events():
+    """Server-Sent Events stream of the user's changes, so open dashboards update without polling.
+
+    Events: expense-added (the expense), expense-deleted ({id}),
+    expenses-changed ({count}, for bulk changes), stats (as /api/stats plus
+    the data version) and past-month-regenerated. A stream that falls more
+    than EVENT_QUEUE_SIZE messages behind loses the oldest and is sent a
+    resync event ({dropped}) to reload from the API.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    subscription = event_broker.subscribe(session['user_id'])
+    if subscription is None:
+        return jsonify({'error': 'Too many open event streams'}), 429
+    heartbeat = app.config['EVENT_HEARTBEAT_SECONDS']
+
+    # Runs after the request has been torn down, so it holds no database
+    # connection; a disconnect surfaces as the next write failing
+    def stream():
+        try:
+            yield f'retry: {heartbeat * 1000}\n\n'
+            while not subscription.closed:
+                messages, dropped = subscription.take(heartbeat)
+                if dropped:
+                    yield format_event('resync', app.json.dumps({'dropped': dropped}))
+                if messages:
+                    yield ''.join(messages)
+                elif not dropped:
+                    yield ': keep-alive\n\n'
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy hold events back
+    return response
 
 @app.route('/api/stats')
 def get_stats():
     try:
-        print("Stats endpoint called")  # Debug log
-        
         if 'user_id' not in session:
-            print("User not authenticated")
             return jsonify({'error': 'Not authenticated'}), 401
         
         user_id = session['user_id']
-        print(f"Getting stats for user: {user_id}")
-        
-        # Ensure user exists in expenses dict
-        if user_id not in expenses:
-            expenses[user_id] = []
-            print(f"Initialized empty expenses for user: {user_id}")
-        
-        user_expenses = expenses.get(user_id, [])
-        print(f"Found {len(user_expenses)} expenses for user")
-        
-        # Find user data - more robust search
-        user = None
-        for email, user_data in users.items():
-            if user_data['id'] == user_id:
-                user = user_data
-                break
-        
-        if not user:
-            print(f"User {user_id} not found in users database")
-            # Create a default user to prevent errors
-            user = {
-                'id': user_id,
-                'monthly_budget': 30000,
-                'name': 'User',
-                'email': 'user@example.com'
-            }
-            print(f"Created default user data for {user_id}")
-        
-        # Calculate statistics
-        total_spent = sum(exp['amount'] for exp in user_expenses)
-        budget = user.get('monthly_budget', 30000)
-        remaining = max(0, budget - total_spent)  # Ensure remaining is not negative
-        
-        # Category breakdown
-        category_totals = {}
-        for exp in user_expenses:
-            cat = exp.get('category', 'Other')  # Default category if missing
-            category_totals[cat] = category_totals.get(cat, 0) + exp.get('amount', 0)
-        
-        stats_data = {
-            'total_spent': total_spent,
-            'budget': budget,
-            'remaining': remaining,
-            'budget_used_percentage': min(100, (total_spent / budget * 100)) if budget > 0 else 0,
-            'category_totals': category_totals,
-            'expense_count': len(user_expenses)
-        }
+        stats_log.debug("Getting stats for user: %s", user_id)
         
-        print(f"Returning stats: {stats_data}")
-        return jsonify(stats_data)
+        version = store.data_version(user_id)
+        return cached_json(('stats', user_id, version), lambda: compute_stats(user_id))
         
     except Exception as e:
-        print(f"Error getting stats: {str(e)}")  # For debugging
-        import traceback
-        traceback.print_exc()
+        stats_log.exception("Error getting stats: %s", e)
         
         # Return default stats to prevent frontend errors
         default_stats = {
@@ -665,6 +1463,62 @@ def get_stats():
         }
         return jsonify(default_stats)
 
+def period_bounds(period, today):
+    """First and last day of the calendar week, month, quarter or year containing ``today``"""
+    if period == 'week':
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6)
+    if period == 'month':
+        first_month = today.month
+        months = 1
+    elif period == 'quarter':
+        first_month = (today.month - 1) // 3 * 3 + 1
+        months = 3
+    elif period == 'year':
+        first_month = 1
+        months = 12
+    else:
+        raise ValueError('Invalid period, expected week, month, quarter or year')
+    start = today.replace(month=first_month, day=1)
+    next_month = first_month + months
+    if next_month > 12:
+        end = start.replace(year=start.year + 1, month=next_month - 12)
+    else:
+        end = start.replace(month=next_month)
+    return start, end - timedelta(days=1)
+
+@app.route('/api/stats/range')
+def get_range_stats():
+    """Spend between two dates (inclusive), or over the current ?period=week|month|quarter|year"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    user_id = session['user_id']
+    start = request.args.get('from')
+    end = request.args.get('to')
+    period = request.args.get('period')
+    if period:
+        try:
+            start, end = (day.isoformat() for day in period_bounds(period, datetime.now().date()))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    def build():
+        total_spent, expense_count, category_totals = store.range_totals(user_id, start, end)
+        return {
+            'from': start,
+            'to': end,
+            'total_spent': total_spent,
+            'expense_count': expense_count,
+            'category_totals': category_totals
+        }
+
+    version = store.data_version(user_id)
+    try:
+        return cached_json(('range-stats', user_id, version, start, end), build)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD'}), 400
+
 @app.route('/analytics')
 def analytics():
     if 'user_id' not in session:
@@ -685,36 +1539,15 @@ def get_past_month_data():
         user_id = session['user_id']
         
         # Ensure past month data exists for this user
-        if user_id not in past_month_data or not past_month_data[user_id]:
-            print(f"Generating past month data for user: {user_id}")
-            past_month_data[user_id] = generate_past_month_data(user_id)
-        
-        past_data = past_month_data.get(user_id, [])
-        total_amount = sum(exp['amount'] for exp in past_data)
-        
-        print(f"Returning {len(past_data)} past month expenses totaling ₹{total_amount}")
-        
-        # If still no data, generate some basic sample data
-        if not past_data:
-            print("No past data found, creating minimal sample data")
-            past_data = [
-                {
-                    'id': str(uuid.uuid4()),
-                    'title': 'Sample Expense',
-                    'amount': 50000,
-                    'category': 'Other',
-                    'date': (datetime.now() - timedelta(days=15)).strftime('%Y-%m-%d'),
-                    'description': 'Sample past month data'
-                }
-            ]
-            past_month_data[user_id] = past_data
+        wait_for_past_month_data(user_id)
         
-        return jsonify(past_data)
+        fields = requested_fields()
+        version = store.data_version(user_id)
+        return cached_json(('past-month-data', user_id, version, fields),
+                           lambda: store.list_past_expenses(user_id).to_dicts(fields))
         
     except Exception as e:
-        print(f"Error getting past month data: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        analytics_log.exception("Error getting past month data: %s", e)
         
         # Return minimal sample data to prevent frontend errors
         sample_data = [
@@ -738,190 +1571,24 @@ def get_analytics_summary():
         user_id = session['user_id']
         
         # Ensure past month data exists
-        if user_id not in past_month_data or not past_month_data[user_id]:
-            print(f"Generating past month data for analytics: {user_id}")
-            past_month_data[user_id] = generate_past_month_data(user_id)
-        
-        past_data = past_month_data.get(user_id, [])
-        
-        # If still no data, create minimal sample
-        if not past_data:
-            past_data = [
-                {
-                    'id': str(uuid.uuid4()),
-                    'title': 'Sample Expense',
-                    'amount': 50000,
-                    'category': 'Other',
-                    'date': (datetime.now() - timedelta(days=15)).strftime('%Y-%m-%d'),
-                    'description': 'Sample past month data'
-                }
-            ]
-            past_month_data[user_id] = past_data
-        
-        # Calculate analytics
-        total_spent = sum(exp['amount'] for exp in past_data)
-        
-        # Category breakdown
-        category_totals = {}
-        for exp in past_data:
-            cat = exp.get('category', 'Other')
-            category_totals[cat] = category_totals.get(cat, 0) + exp.get('amount', 0)
-        
-        # Daily spending pattern
-        daily_spending = {}
-        for exp in past_data:
-            date = exp.get('date', datetime.now().strftime('%Y-%m-%d'))
-            daily_spending[date] = daily_spending.get(date, 0) + exp.get('amount', 0)
-        
-        # Identify unnecessary expenses with more detailed criteria
-        unnecessary_expenses = []
-        savings_potential = 0
-        
-        for exp in past_data:
-            is_unnecessary = False
-            saving_percentage = 0
-            reason = ""
-            amount = exp.get('amount', 0)
-            category = exp.get('category', 'Other')
-            
-            # Food & Dining - expensive meals/dining out
-            if category == 'Food & Dining' and amount > 400:
-                is_unnecessary = True
-                saving_percentage = 0.4  # 40% savings potential
-                reason = "Expensive dining - consider home cooking"
-            elif category == 'Food & Dining' and amount > 250:
-                is_unnecessary = True
-                saving_percentage = 0.25  # 25% savings potential
-                reason = "Frequent dining out - reduce frequency"
-            
-            # Entertainment - high entertainment costs
-            elif category == 'Entertainment' and amount > 800:
-                is_unnecessary = True
-                saving_percentage = 0.5  # 50% savings potential
-                reason = "Expensive entertainment - find cheaper alternatives"
-            elif category == 'Entertainment' and amount > 400:
-                is_unnecessary = True
-                saving_percentage = 0.3  # 30% savings potential
-                reason = "High entertainment spending - consider free activities"
-            
-            # Shopping - non-essential purchases
-            elif category == 'Shopping' and amount > 1500:
-                is_unnecessary = True
-                saving_percentage = 0.6  # 60% savings potential
-                reason = "Expensive shopping - avoid impulse purchases"
-            elif category == 'Shopping' and amount > 800:
-                is_unnecessary = True
-                saving_percentage = 0.35  # 35% savings potential
-                reason = "Frequent shopping - create a budget"
-            
-            # Transportation - expensive rides
-            elif category == 'Transportation' and amount > 200:
-                is_unnecessary = True
-                saving_percentage = 0.3  # 30% savings potential
-                reason = "Expensive transport - use public transport"
-            
-            # Other categories with high amounts
-            elif category == 'Other' and amount > 1000:
-                is_unnecessary = True
-                saving_percentage = 0.4  # 40% savings potential
-                reason = "High miscellaneous spending - track expenses better"
-            
-            if is_unnecessary:
-                exp_copy = exp.copy()
-                exp_copy['saving_potential'] = amount * saving_percentage
-                exp_copy['saving_reason'] = reason
-                exp_copy['saving_percentage'] = saving_percentage * 100
-                unnecessary_expenses.append(exp_copy)
-                savings_potential += amount * saving_percentage
-        
-        # Generate more comprehensive savings recommendations
-        recommendations = []
-        
-        # Food & Dining recommendations
-        food_spending = category_totals.get('Food & Dining', 0)
-        if food_spending > 12000:
-            recommendations.append({
-                'category': 'Food & Dining',
-                'current': food_spending,
-                'suggested': 10000,
-                'savings': food_spending - 10000,
-                'tip': 'Cook more meals at home, meal prep on weekends, and limit dining out to special occasions'
-            })
-        elif food_spending > 8000:
-            recommendations.append({
-                'category': 'Food & Dining',
-                'current': food_spending,
-                'suggested': 7000,
-                'savings': food_spending - 7000,
-                'tip': 'Try cooking 2-3 more meals at home per week and pack lunch for work'
-            })
-        
-        # Entertainment recommendations
-        entertainment_spending = category_totals.get('Entertainment', 0)
-        if entertainment_spending > 4000:
-            recommendations.append({
-                'category': 'Entertainment',
-                'current': entertainment_spending,
-                'suggested': 2500,
-                'savings': entertainment_spending - 2500,
-                'tip': 'Explore free entertainment like parks, free museums, home movie nights, and community events'
-            })
-        elif entertainment_spending > 2500:
-            recommendations.append({
-                'category': 'Entertainment',
-                'current': entertainment_spending,
-                'suggested': 2000,
-                'savings': entertainment_spending - 2000,
-                'tip': 'Look for discounts, group deals, and free activities in your area'
-            })
-        
-        # Shopping recommendations
-        shopping_spending = category_totals.get('Shopping', 0)
-        if shopping_spending > 6000:
-            recommendations.append({
-                'category': 'Shopping',
-                'current': shopping_spending,
-                'suggested': 4000,
-                'savings': shopping_spending - 4000,
-                'tip': 'Create a shopping list, wait 24 hours before non-essential purchases, and compare prices online'
-            })
-        elif shopping_spending > 4000:
-            recommendations.append({
-                'category': 'Shopping',
-                'current': shopping_spending,
-                'suggested': 3000,
-                'savings': shopping_spending - 3000,
-                'tip': 'Set a monthly shopping budget and stick to it. Avoid impulse purchases'
-            })
-        
-        # Transportation recommendations
-        transport_spending = category_totals.get('Transportation', 0)
-        if transport_spending > 4000:
-            recommendations.append({
-                'category': 'Transportation',
-                'current': transport_spending,
-                'suggested': 3000,
-                'savings': transport_spending - 3000,
-                'tip': 'Use public transport, carpool, or walk/bike for short distances. Plan trips efficiently'
-            })
-        
-        analytics_data = {
-            'total_spent': total_spent,
-            'category_totals': category_totals,
-            'daily_spending': daily_spending,
-            'unnecessary_expenses': unnecessary_expenses,
-            'savings_potential': savings_potential,
-            'recommendations': recommendations,
-            'expense_count': len(past_data)
-        }
-        
-        print(f"Returning analytics for {len(past_data)} expenses, total: ₹{total_spent}")
-        return jsonify(analytics_data)
+        wait_for_past_month_data(user_id)
+        
+        def build():
+            past_data = store.list_past_expenses(user_id)
+            analytics_data = summarize(past_data, rules, engine=app.config['ANALYTICS_ENGINE'])
+            analytics_log.debug("Returning analytics for %d expenses, total: ₹%s",
+                                analytics_data['expense_count'], analytics_data['total_spent'])
+            analytics_data['unnecessary_expenses'] = select_fields(analytics_data['unnecessary_expenses'], fields)
+            return analytics_data
+        
+        fields = requested_fields()
+        version = store.data_version(user_id)
+        rules_stamp, rules = savings_rules.current()
+        return cached_json(('analytics-summary', user_id, version, rules_stamp,
+                            app.config['ANALYTICS_ENGINE'], fields), build)
         
     except Exception as e:
-        print(f"Error getting analytics summary: {str(e)}")  # For debugging
-        import traceback
-        traceback.print_exc()
+        analytics_log.exception("Error getting analytics summary: %s", e)
         
         # Return minimal analytics data to prevent frontend errors
         default_analytics = {
@@ -942,15 +1609,17 @@ def regenerate_past_data():
             return jsonify({'error': 'Not authenticated'}), 401
         
         user_id = session['user_id']
-        print(f"Regenerating past month data for user: {user_id}")
+        generation_log.info("Regenerating past month data for user: %s", user_id)
         
         # Force regenerate past month data
-        past_month_data[user_id] = generate_past_month_data(user_id)
+        past_data = generate_past_month_data(user_id)
+        store.replace_past_expenses(user_id, past_data)
+        publish_past_month(user_id, past_data)
         
-        total_amount = sum(exp['amount'] for exp in past_month_data[user_id])
-        expense_count = len(past_month_data[user_id])
+        total_amount = sum(exp['amount'] for exp in past_data)
+        expense_count = len(past_data)
         
-        print(f"Generated {expense_count} expenses totaling ₹{total_amount}")
+        generation_log.info("Generated %d expenses totaling ₹%s", expense_count, total_amount)
         
         return jsonify({
             'success': True, 
@@ -960,12 +1629,12 @@ def regenerate_past_data():
         })
         
     except Exception as e:
-        print(f"Error regenerating past data: {str(e)}")
+        generation_log.exception("Error regenerating past data: %s", e)
         return jsonify({'error': 'Failed to regenerate data'}), 500
 
 @app.route('/api/categories')
 def get_categories():
-    return jsonify(categories)
+    return cached_json(('categories',), lambda: categories)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""Stress one user from many threads and check nothing is lost, then measure read scaling.
+
+Usage: python benchmarks/bench_concurrency.py [--threads 16] [--writes 200]
+                                              [--batches 20] [--readers 1 2 4 8]
+                                              [--seconds 2]
+
+Every writer thread adds ``--writes`` expenses to the same user and deletes
+every third one it added. Afterwards the rows, running totals, daily
+rollups, row counts and data version must all agree with what the threads
+did, or the script exits non-zero. Next, half the threads send
+``--batches`` all-or-nothing batch requests while the other half add
+single expenses to the same (second) user, which must neither fail nor
+stall on the database lock. Then pools of reader threads hit the first
+user's endpoints (response cache disabled) for ``--seconds`` each and the
+throughput is reported per pool size.
+
+The run uses a temporary database, so the shipped expense_tracker.db is
+never touched.
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USER_ID = 'stress-user'
+BATCH_USER_ID = 'batch-user'
+
+# Items created per batch request
+BATCH_SIZE = 20
+
+
+def client_for(app_module, user_id=USER_ID):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
+
+
+def run_threads(count, target):
+    start = threading.Barrier(count)
+    threads = [threading.Thread(target=target, args=(i, start)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def stress_writes(app_module, n_threads, n_writes):
+    kept = [0] * n_threads
+    spent = [0] * n_threads
+    failures = []
+
+    def writer(index, start):
+        client = client_for(app_module)
+        start.wait()
+        for i in range(n_writes):
+            amount = index * 1000 + i + 1
+            response = client.post('/api/expenses', json={
+                'title': f'T{index}', 'amount': amount, 'category': app_module.categories[i % 9],
+                'date': f'2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}'
+            })
+            if response.status_code != 200:
+                failures.append(response.get_json())
+                continue
+            if i % 3 == 0:
+                if client.delete(f"/api/expenses/{response.get_json()['id']}").status_code != 200:
+                    failures.append('delete failed')
+                    continue
+            else:
+                kept[index] += 1
+                spent[index] += amount
+
+    started = time.perf_counter()
+    run_threads(n_threads, writer)
+    elapsed = time.perf_counter() - started
+
+    store = app_module.store
+    deletes = len(range(0, n_writes, 3)) * n_threads
+    expected_count, expected_total = sum(kept), sum(spent)
+    row = store.conn.execute(
+        'SELECT COUNT(*) AS count, SUM(amount) AS total FROM expenses WHERE user_id = ?', (USER_ID,)
+    ).fetchone()
+    total, count, _ = store.expense_totals(USER_ID)
+    range_total, range_count, _ = store.range_totals(USER_ID)
+    checks = {
+        'requests': (len(failures), 0),
+        'rows': (row['count'], expected_count),
+        'row total': (row['total'], expected_total),
+        'running count': (count, expected_count),
+        'running total': (total, expected_total),
+        'rollup count': (range_count, expected_count),
+        'rollup total': (range_total, expected_total),
+        'row gauge': (store.sizes()['expenses'],
+                      store.conn.execute('SELECT COUNT(*) AS n FROM expenses').fetchone()['n']),
+        'data version': (store.data_version(USER_ID), n_threads * n_writes + deletes),
+    }
+    store.release()
+    ops = n_threads * n_writes + deletes
+    print(f'{n_threads} writers, {ops} writes in {elapsed:.2f}s ({ops / elapsed:.0f}/s)')
+    bad = 0
+    for name, (actual, expected) in checks.items():
+        ok = math.isclose(actual, expected, abs_tol=1e-6)
+        bad += not ok
+        print(f"  {name:<14} {actual!s:>14} {'ok' if ok else f'EXPECTED {expected}'}")
+    return bad
+
+
+def stress_batches(app_module, n_threads, n_batches):
+    """Batch requests racing single writes on one user; returns the number of failed checks"""
+    failures = []
+    kept = [0] * n_threads
+
+    def writer(index, start):
+        client = client_for(app_module, BATCH_USER_ID)
+        start.wait()
+        for i in range(n_batches):
+            if index % 2:
+                items = [{'title': f'B{index}', 'amount': 1, 'category': 'Other'}] * BATCH_SIZE
+                response = client.post('/api/expenses/batch', json={'create': items})
+                added = BATCH_SIZE
+            else:
+                response = client.post('/api/expenses', json={'title': f'S{index}', 'amount': 1, 'category': 'Other'})
+                added = 1
+            if response.status_code != 200:
+                failures.append(response.status_code)
+            else:
+                kept[index] += added
+
+    started = time.perf_counter()
+    run_threads(n_threads, writer)
+    elapsed = time.perf_counter() - started
+
+    store = app_module.store
+    row = store.conn.execute(
+        'SELECT COUNT(*) AS count FROM expenses WHERE user_id = ?', (BATCH_USER_ID,)
+    ).fetchone()
+    checks = {
+        'requests': (len(failures), 0),
+        'rows': (row['count'], sum(kept)),
+        'running count': (store.expense_totals(BATCH_USER_ID)[1], sum(kept)),
+    }
+    store.release()
+    print(f'\n{n_threads} threads mixing batch and single writes: '
+          f'{n_threads * n_batches} requests in {elapsed:.2f}s')
+    bad = 0
+    for name, (actual, expected) in checks.items():
+        ok = actual == expected
+        bad += not ok
+        print(f"  {name:<14} {actual!s:>14} {'ok' if ok else f'EXPECTED {expected}'}")
+    return bad
+
+
+def read_throughput(app_module, n_threads, seconds):
+    counts = [0] * n_threads
+    stop = time.perf_counter() + seconds
+
+    def reader(index, start):
+        client = client_for(app_module)
+        start.wait()
+        paths = ('/api/expenses?limit=50', '/api/stats', '/api/stats/range?period=quarter')
+        n = 0
+        while time.perf_counter() < stop:
+            client.get(paths[n % len(paths)])
+            n += 1
+        counts[index] = n
+
+    run_threads(n_threads, reader)
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='writer threads')
+    parser.add_argument('--writes', type=int, default=200, help='expenses added per writer')
+    parser.add_argument('--batches', type=int, default=20, help='requests per thread in the batch test')
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=2.0, help='duration of each read run')
+    args = parser.parse_args()
+
+    os.environ['EXPENSE_TRACKER_DB'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    import app as app_module
+    app_module.response_cache.max_bytes = 0  # every read does the real work
+    for user_id in (USER_ID, BATCH_USER_ID):
+        app_module.store.create_user({
+            'id': user_id, 'email': f'{user_id}@bench.local', 'password': 'bench',
+            'name': 'Stress', 'monthly_budget': 30000
+        })
+
+    bad = stress_writes(app_module, args.threads, args.writes)
+    bad += stress_batches(app_module, args.threads, args.batches)
+
+    print(f"\n{'readers':>8} {'req/s':>10} {'scaling':>8}")
+    baseline = None
+    for n in args.readers:
+        rate = read_throughput(app_module, n, args.seconds)
+        baseline = baseline or rate / n
+        print(f'{n:>8} {rate:>10.0f} {rate / baseline:>7.2f}x')
+
+    if bad:
+        print(f'\n{bad} consistency check(s) failed')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Measure per-expense memory of plain dict rows vs the columnar ExpenseColumns.
+
+Usage: python benchmarks/bench_memory.py [--rows 100000]
+
+Rows come from generate_past_month_data and are stored in a temporary
+database, so the shipped expense_tracker.db is never touched.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    os.environ['EXPENSE_TRACKER_DB'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    import app as app_module
+
+    rows = []
+    while len(rows) < args.rows:
+        rows.extend(app_module.generate_past_month_data('bench_user'))
+    app_module.store.replace_past_expenses('bench_user', rows[:args.rows])
+    del rows
+
+    columns, columnar_size = measure(lambda: app_module.store.list_past_expenses('bench_user'))
+    dicts, dict_size = measure(columns.to_dicts)
+
+    n = len(columns)
+    print(f'rows: {n}')
+    print(f'dict rows:      {dict_size / n:8.1f} bytes/expense')
+    print(f'ExpenseColumns: {columnar_size / n:8.1f} bytes/expense')
+    print(f'reduction:      {dict_size / columnar_size:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
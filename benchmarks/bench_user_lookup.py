@@ -0,0 +1,63 @@
+"""Benchmark /api/stats latency as the number of registered users grows.
+
+Usage: python benchmarks/bench_user_lookup.py [--sizes 1000 10000 100000 1000000]
+
+Each size runs against a fresh temporary database, so the shipped
+expense_tracker.db is never touched.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def bench(app_module, n_users, requests):
+    store = app_module.store
+    batch = []
+    for i in range(store.count_users(), n_users):
+        batch.append({
+            'id': str(uuid.uuid4()),
+            'email': f'user{i}@bench.local',
+            'password': 'bench',
+            'name': f'User {i}',
+            'monthly_budget': 30000
+        })
+        if len(batch) == 50000:
+            store.create_users(batch)
+            batch = []
+    if batch:
+        store.create_users(batch)
+    store.release()
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'demo_user'
+    client.get('/api/stats')  # warm up
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/stats')
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ['EXPENSE_TRACKER_DB'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    import app as app_module
+
+    print(f"{'users':>10}  {'/api/stats (us)':>16}")
+    for size in sorted(args.sizes):
+        print(f'{size:>10}  {bench(app_module, size, args.requests):>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Benchmark the hot functions and endpoints at several user counts and per-user history sizes.
+
+Usage:
+    python benchmarks/suite.py [--sizes 10 1000 100000] [--users 1000 10000]
+                               [--save baseline.json] [--compare baseline.json]
+                               [--threshold 0.25]
+
+For each of the ``--users`` counts (smallest first, as filler accounts are
+only ever added), the database is topped up to that many filler accounts
+and every size gets its own user whose current and past month history
+both hold that many expenses. Results are keyed users/size/benchmark, so
+a comparison only ever pairs runs of the same shape. Endpoints
+are driven through the Flask test client with the response cache
+disabled, so each call does the full work. ``--save`` writes the results
+as a JSON baseline; ``--compare`` exits non-zero if any benchmark's median
+got slower than the baseline by more than ``--threshold`` (a fraction).
+
+The suite runs against a temporary database, so the shipped
+expense_tracker.db is never touched.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat):
+    samples = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        fn()  # warm up
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1e6)
+    return {'median_us': statistics.median(samples), 'min_us': min(samples), 'runs': repeat}
+
+
+def history(app_module, rng, size):
+    rows = []
+    while len(rows) < size:
+        rows.extend(app_module.generate_past_month_data('bench', rng))
+    return rows[:size]
+
+
+def seed(app_module, size, filler_users, rng):
+    store = app_module.store
+    existing = store.count_users()
+    if filler_users > existing:
+        store.create_users([{
+            'id': str(uuid.uuid4()),
+            'email': f'filler{i}@bench.local',
+            'password': 'bench',
+            'name': f'Filler {i}',
+            'monthly_budget': 30000
+        } for i in range(existing, filler_users)])
+    user_id = f'bench-{filler_users}-{size}'
+    store.create_user({
+        'id': user_id,
+        'email': f'{user_id}@bench.local',
+        'password': 'bench',
+        'name': user_id,
+        'monthly_budget': 30000
+    })
+    store.add_expenses(user_id, history(app_module, rng, size))
+    store.replace_past_expenses(user_id, history(app_module, rng, size))
+    store.release()
+    return user_id
+
+
+def run_size(app_module, size, filler_users, repeat):
+    rng = random.Random(f'{filler_users}/{size}')
+    user_id = seed(app_module, size, filler_users, rng)
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    # Fewer repetitions for the heaviest calls on big histories
+    heavy_repeat = max(3, repeat // 10) if size >= 100000 else repeat
+    new_expense = {'title': 'Bench', 'amount': 123, 'category': 'Shopping', 'date': '2026-01-01'}
+    deletable = [client.post('/api/expenses', json=new_expense).get_json()['id'] for _ in range(repeat + 1)]
+
+    results = {
+        'generate_past_month_data': timed(lambda: app_module.generate_past_month_data(user_id, rng), repeat),
+        'GET /api/stats': timed(lambda: client.get('/api/stats'), repeat),
+        'GET /api/stats/range?period=quarter': timed(lambda: client.get('/api/stats/range?period=quarter'), repeat),
+        'GET /api/expenses/query': timed(
+            lambda: client.get('/api/expenses/query?category=Shopping&min_amount=800&period=quarter'), repeat),
+        'GET /api/expenses?limit=50': timed(lambda: client.get('/api/expenses?limit=50'), repeat),
+        'GET /api/expenses': timed(lambda: client.get('/api/expenses'), heavy_repeat),
+        'GET /api/analytics-summary': timed(lambda: client.get('/api/analytics-summary'), heavy_repeat),
+        'POST /api/expenses': timed(lambda: client.post('/api/expenses', json=new_expense), repeat),
+        'DELETE /api/expenses/<id>': timed(lambda: client.delete(f'/api/expenses/{deletable.pop()}'), repeat),
+    }
+    return {f'{filler_users}/{size}/{name}': result for name, result in results.items()}
+
+
+def compare(results, baseline, threshold):
+    regressions = 0
+    print(f"\n{'benchmark':<56} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, result in results.items():
+        before = baseline.get('results', {}).get(key)
+        if before is None:
+            continue
+        change = result['median_us'] / before['median_us'] - 1
+        flag = ''
+        if change > threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(f"{key:<56} {before['median_us']:>10.1f}us {result['median_us']:>10.1f}us {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--users', type=int, nargs='+', default=[1000], help='filler user counts to run at')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against this JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown of a median before it counts as a regression')
+    args = parser.parse_args()
+
+    os.environ['EXPENSE_TRACKER_DB'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import app as app_module
+    app_module.response_cache.max_bytes = 0  # measure the real work, not cache hits
+
+    results = {}
+    for users in sorted(args.users):
+        for size in args.sizes:
+            results.update(run_size(app_module, size, users, args.repeat))
+
+    print(f"{'benchmark':<56} {'median':>12} {'min':>12}")
+    for key, result in results.items():
+        print(f"{key:<56} {result['median_us']:>10.1f}us {result['min_us']:>10.1f}us")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'sizes': args.sizes,
+                    'users': sorted(args.users),
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                },
+                'results': results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{regressions} benchmark(s) regressed by more than {args.threshold:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Size-bounded LRU cache for serialised API responses"""
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Maps keys to response bodies (bytes), evicting least recently used
+    entries once the total size exceeds ``max_bytes``.
+
+    Keys embed the user's data version, so a mutation never needs to
+    invalidate anything: stale entries simply stop being requested and age out.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
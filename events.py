@@ -0,0 +1,100 @@
+"""Per-user change events fanned out to Server-Sent Events streams"""
+import threading
+from collections import deque
+
+
+def format_event(event, data):
+    """One SSE message; ``data`` is already-encoded JSON without newlines"""
+    return f'event: {event}\ndata: {data}\n\n'
+
+
+class Subscription:
+    """One open stream's bounded queue of pending messages.
+
+    Publishers never wait on a slow reader: once ``capacity`` messages are
+    pending, each new one pushes out the oldest, and the number pushed out
+    is handed to the reader so it can tell the client to resync.
+    """
+
+    __slots__ = ('user_id', 'closed', '_messages', '_dropped', '_ready')
+
+    def __init__(self, user_id, capacity):
+        self.user_id = user_id
+        self.closed = False
+        self._messages = deque(maxlen=capacity)
+        self._dropped = 0
+        self._ready = threading.Condition(threading.Lock())
+
+    def put(self, message):
+        with self._ready:
+            if len(self._messages) == self._messages.maxlen:
+                self._dropped += 1
+            self._messages.append(message)
+            self._ready.notify()
+
+    def take(self, timeout):
+        """Wait up to ``timeout`` seconds for messages, returning (messages, dropped) since the last take"""
+        with self._ready:
+            if not self._messages and not self.closed:
+                self._ready.wait(timeout)
+            messages = list(self._messages)
+            self._messages.clear()
+            dropped, self._dropped = self._dropped, 0
+        return messages, dropped
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+
+
+class EventBroker:
+    """Routes each user's events to that user's open subscriptions.
+
+    The per-user subscription tuples are swapped rather than mutated, so
+    ``publish`` reads them without taking the lock. Each event is encoded
+    once, however many streams it goes to.
+    """
+
+    def __init__(self, dumps, capacity=100, max_per_user=8):
+        self._dumps = dumps
+        self.capacity = capacity
+        self.max_per_user = max_per_user
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Open a subscription, or return None if the user already has ``max_per_user``"""
+        with self._lock:
+            current = self._subscriptions.get(user_id, ())
+            if len(current) >= self.max_per_user:
+                return None
+            subscription = Subscription(user_id, self.capacity)
+            self._subscriptions[user_id] = current + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            remaining = tuple(
+                other for other in self._subscriptions.get(subscription.user_id, ())
+                if other is not subscription
+            )
+            if remaining:
+                self._subscriptions[subscription.user_id] = remaining
+            else:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscriptions
+
+    def publish(self, user_id, event, data):
+        subscriptions = self._subscriptions.get(user_id)
+        if not subscriptions:
+            return
+        message = format_event(event, self._dumps(data))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def stream_count(self):
+        return sum(map(len, list(self._subscriptions.values())))
@@ -0,0 +1,69 @@
+"""Non-blocking, levelled logging for the app.
+
+Request threads only merge a record's %-style arguments into its message
+and put it on a queue; a single listener thread does the formatting
+(timestamp, JSON, traceback) and the I/O. Messages use lazy %-style
+arguments, so anything below the configured level costs one level check
+and nothing else.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOGGER_NAME = 'expense_tracker'
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock ``prepare()`` runs the full formatter, traceback included, on
+    the logging thread. Only the arguments are merged here, as they may be
+    objects the caller goes on to change.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level='WARNING', fmt='text'):
+    """Route the app's loggers through a queue to stderr, returning the root app logger"""
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        return logger
+
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(DeferredQueueHandler(records))
+    logger.propagate = False
+    return logger
@@ -0,0 +1,97 @@
+"""Opt-in cProfile capture of single requests, kept in a bounded ring buffer"""
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import threading
+import time
+from collections import deque
+
+
+class ProfileBuffer:
+    """Holds the last ``capacity`` request profiles, oldest dropped first.
+
+    Only one request is profiled at a time: ``start()`` returns None while
+    another capture is running, so concurrent requests are never slowed by
+    more than one profiler and never fight over the interpreter's hooks.
+    """
+
+    def __init__(self, capacity=20):
+        self._profiles = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+
+    def start(self):
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # some other profiler or debugger owns the hook
+            self._active.release()
+            return None
+        return profiler
+
+    def stop(self, profiler, **meta):
+        """Finish a capture started by ``start()`` and store it, returning its id"""
+        profiler.disable()
+        self._active.release()
+        profiler.create_stats()
+        entry = dict(meta, id=next(self._ids), created=time.time(), stats=profiler.stats)
+        with self._lock:
+            self._profiles.append(entry)
+        return entry['id']
+
+    def cancel(self, profiler):
+        """Abandon a capture that never reached ``stop()``"""
+        profiler.disable()
+        self._active.release()
+
+    def summaries(self):
+        """Metadata for the buffered profiles, newest first"""
+        with self._lock:
+            entries = list(self._profiles)
+        return [
+            {key: value for key, value in entry.items() if key != 'stats'}
+            for entry in reversed(entries)
+        ]
+
+    def get(self, profile_id):
+        with self._lock:
+            for entry in self._profiles:
+                if entry['id'] == profile_id:
+                    return entry
+        return None
+
+
+class _Snapshot:
+    """Adapts a captured stats dict to what ``pstats.Stats`` loads from.
+
+    Loading takes ``.stats`` away from its source, so each report gets a
+    fresh snapshot.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profile_text(entry, sort='cumulative', limit=60):
+    """pstats report for a captured profile"""
+    out = io.StringIO()
+    stats = pstats.Stats(_Snapshot(entry['stats']), stream=out)
+    stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def profile_dump(entry):
+    """The profile in the binary format written by ``pstats.Stats.dump_stats``.
+
+    Loadable with ``pstats.Stats(path)`` and by viewers such as snakeviz or
+    flameprof that render it as a flame graph.
+    """
+    return marshal.dumps(entry['stats'])
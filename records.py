@@ -0,0 +1,131 @@
+"""Compact in-memory representation of expense rows"""
+import re
+import uuid
+from array import array
+from datetime import date
+from functools import lru_cache
+
+
+def encode_id(expense_id):
+    """Turn an expense id string into its 16-byte form, raising ValueError if malformed"""
+    return uuid.UUID(str(expense_id)).bytes
+
+
+def decode_id(raw):
+    # Same text as str(uuid.UUID(bytes=raw)), without building a UUID object
+    h = raw.hex()
+    return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+
+
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def parse_date(value):
+    """Parse a strict YYYY-MM-DD string, raising ValueError for anything else.
+
+    ``date.fromisoformat`` alone also takes forms like 20261005 and
+    2026-W40-1, and ``strptime`` takes 2026-1-5.
+    """
+    value = str(value)
+    if not ISO_DATE.fullmatch(value):
+        raise ValueError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+    return date.fromisoformat(value)
+
+
+def encode_day(value):
+    """Turn a YYYY-MM-DD string into a day ordinal, raising ValueError if malformed"""
+    return parse_date(value).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def decode_day(day):
+    return date.fromordinal(day).isoformat()
+
+
+def decode_amount(amount):
+    # Whole amounts round-trip as ints, exactly as the JSON has always shown them
+    return int(amount) if amount.is_integer() else amount
+
+
+RECORD_FIELDS = ('id', 'title', 'amount', 'category', 'date', 'description')
+
+
+class ExpenseColumns:
+    """A batch of expenses stored column by column.
+
+    Ids are packed 16 bytes apiece, dates are day ordinals, categories are
+    int codes into ``category_names`` and repeated titles and
+    descriptions share a single string object. Iterating yields the same
+    dicts the API has always returned.
+    """
+
+    __slots__ = ('ids', 'titles', 'amounts', 'codes', 'days', 'descriptions',
+                 'category_names', '_strings')
+
+    def __init__(self, category_names):
+        self.ids = bytearray()
+        self.titles = []
+        self.amounts = array('d')
+        self.codes = array('I')
+        self.days = array('l')
+        self.descriptions = []
+        self.category_names = category_names
+        self._strings = {}
+
+    def append(self, raw_id, title, amount, code, day, description):
+        strings = self._strings
+        self.ids += raw_id
+        self.titles.append(strings.setdefault(title, title))
+        self.amounts.append(amount)
+        self.codes.append(code)
+        self.days.append(day)
+        self.descriptions.append(strings.setdefault(description, description))
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __bool__(self):
+        return len(self.amounts) > 0
+
+    def record(self, i):
+        return {
+            'id': decode_id(self.ids[i * 16:(i + 1) * 16]),
+            'title': self.titles[i],
+            'amount': decode_amount(self.amounts[i]),
+            'category': self.category_names[self.codes[i]],
+            'date': decode_day(self.days[i]),
+            'description': self.descriptions[i]
+        }
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.record(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('expense index out of range')
+        return self.record(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def to_dicts(self, fields=None):
+        """The records as dicts, holding only ``fields`` if given (unknown names are skipped)"""
+        if fields is None:
+            return list(self)
+        columns = [(name, self._field(name)) for name in fields if name in RECORD_FIELDS]
+        return [{name: value(i) for name, value in columns} for i in range(len(self))]
+
+    def _field(self, name):
+        # Reads one field of record i without decoding the others
+        if name == 'id':
+            return lambda i: decode_id(self.ids[i * 16:(i + 1) * 16])
+        if name == 'amount':
+            return lambda i: decode_amount(self.amounts[i])
+        if name == 'category':
+            return lambda i: self.category_names[self.codes[i]]
+        if name == 'date':
+            return lambda i: decode_day(self.days[i])
+        column = self.titles if name == 'title' else self.descriptions
+        return column.__getitem__
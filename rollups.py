@@ -0,0 +1,115 @@
+"""Per-user daily spend rollups answering date-range totals in O(log days)"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Days either side of today each category's tree has slots for from the
+# start, so expenses dated around now are patched in without a rebuild
+RECENT_DAYS = 7
+
+
+class Fenwick:
+    """Binary indexed tree over a fixed number of slots"""
+
+    __slots__ = ('tree',)
+
+    def __init__(self, size, typecode='d'):
+        self.tree = array(typecode, bytes(array(typecode).itemsize * (size + 1)))
+
+    def add(self, i, value):
+        tree = self.tree
+        i += 1
+        while i < len(tree):
+            tree[i] += value
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of slots 0..i inclusive"""
+        tree = self.tree
+        total = 0
+        i += 1
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def range(self, lo, hi):
+        return self.prefix(hi) - (self.prefix(lo - 1) if lo > 0 else 0)
+
+
+class _CategoryDays:
+    """Spend and counts over one category's days, coordinate-compressed.
+
+    Slots exist only for the days the category has entries on (plus the
+    recent window), so memory follows the number of distinct days rather
+    than the span between the earliest and latest.
+    """
+
+    __slots__ = ('days', 'amounts', 'counts')
+
+    def __init__(self, days):
+        self.days = array('l', days)
+        self.amounts = Fenwick(len(days))
+        self.counts = Fenwick(len(days), 'q')
+
+    def slot(self, day):
+        """Slot of ``day``, or None if it has none"""
+        i = bisect_left(self.days, day)
+        return i if i < len(self.days) and self.days[i] == day else None
+
+
+class DailyRollup:
+    """Spend and expense counts per category per day.
+
+    ``version`` is the data version the rollup reflects; the store patches it
+    in place after each committed write and rebuilds it when it falls behind
+    or a write lands on a (day, category) it has no slot for.
+    """
+
+    __slots__ = ('version', '_categories')
+
+    def __init__(self, version):
+        self.version = version
+        self._categories = {}
+
+    @classmethod
+    def build(cls, version, rows, today):
+        """Build from (day, category, total, count) rows"""
+        recent = range(today - RECENT_DAYS, today + RECENT_DAYS + 1)
+        days = {}
+        for day, category, _, _ in rows:
+            days.setdefault(category, set(recent)).add(day)
+        rollup = cls(version)
+        for category, category_days in days.items():
+            rollup._categories[category] = _CategoryDays(sorted(category_days))
+        for day, category, total, count in rows:
+            rollup.add(day, category, total, count)
+        return rollup
+
+    def covers(self, entries):
+        """Whether every (day, category) in ``entries`` has a slot"""
+        for day, category in entries:
+            tree = self._categories.get(category)
+            if tree is None or tree.slot(day) is None:
+                return False
+        return True
+
+    def add(self, day, category, amount, count):
+        tree = self._categories[category]
+        slot = tree.slot(day)
+        tree.amounts.add(slot, amount)
+        tree.counts.add(slot, count)
+
+    def totals(self, start_day=None, end_day=None):
+        """Return (total, count, {category: total}) for days in ``[start_day, end_day]``"""
+        category_totals = {}
+        expense_count = 0
+        for category, tree in self._categories.items():
+            lo = 0 if start_day is None else bisect_left(tree.days, start_day)
+            hi = len(tree.days) - 1 if end_day is None else bisect_right(tree.days, end_day) - 1
+            if lo > hi:
+                continue
+            count = tree.counts.range(lo, hi)
+            if count > 0:
+                expense_count += count
+                category_totals[category] = tree.amounts.range(lo, hi)
+        return sum(category_totals.values()), expense_count, category_totals
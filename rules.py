@@ -0,0 +1,111 @@
+"""Declarative savings rules, compiled for fast lookup and reloaded when the file changes.
+
+The rule file maps each category to tiers of ``{"above": threshold, ...}``.
+An amount falls into the tier with the highest threshold it exceeds, so
+classifying an expense is one dict lookup plus a bisect over that
+category's sorted thresholds.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger('expense_tracker.rules')
+
+
+class Tiers:
+    """One category's tiers, sorted by ascending threshold"""
+
+    __slots__ = ('thresholds', 'outcomes')
+
+    def __init__(self, tiers):
+        tiers = sorted(tiers, key=lambda tier: tier['above'])
+        self.thresholds = [tier['above'] for tier in tiers]
+        self.outcomes = tiers
+
+    def match(self, amount):
+        """Return the tier with the highest threshold below ``amount``, or None"""
+        i = bisect_left(self.thresholds, amount)
+        return self.outcomes[i - 1] if i else None
+
+
+class CompiledRules:
+    def __init__(self, config):
+        self.unnecessary = {
+            category: Tiers([_unnecessary_tier(tier) for tier in tiers])
+            for category, tiers in config.get('unnecessary_expenses', {}).items()
+        }
+        # Kept in file order, which is the order recommendations are listed in
+        self.recommendations = {
+            category: Tiers([_recommendation_tier(tier) for tier in tiers])
+            for category, tiers in config.get('recommendations', {}).items()
+        }
+
+    def classify(self, category, amount):
+        """Return the unnecessary-expense tier an expense falls into, or None"""
+        tiers = self.unnecessary.get(category)
+        return tiers.match(amount) if tiers else None
+
+
+def _unnecessary_tier(tier):
+    percentage = float(tier['saving_percentage'])
+    if not 0 <= percentage <= 1:
+        raise ValueError(f'saving_percentage must be between 0 and 1, got {percentage}')
+    return {'above': float(tier['above']), 'saving_percentage': percentage, 'reason': str(tier['reason'])}
+
+
+def _recommendation_tier(tier):
+    return {'above': float(tier['above']), 'suggested': tier['suggested'], 'tip': str(tier['tip'])}
+
+
+class RuleBook:
+    """Serves the compiled rules from ``path``, recompiling when the file changes.
+
+    The file's modification time is checked at most every
+    ``check_interval`` seconds. If an edited file fails to load, the
+    previous rules stay in effect.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        mtime = os.stat(path).st_mtime_ns
+        # (mtime, rules) swapped as one, so no reader pairs a new stamp with old rules
+        self._current = (mtime, self._load())
+        self._next_check = time.monotonic() + check_interval
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            return CompiledRules(json.load(f))
+
+    def current(self):
+        """Return (stamp, rules) for the rules in effect, the stamp changing on every reload"""
+        if time.monotonic() >= self._next_check:
+            self._reload_if_changed()
+        return self._current
+
+    @property
+    def rules(self):
+        return self.current()[1]
+
+    @property
+    def stamp(self):
+        return self.current()[0]
+
+    def _reload_if_changed(self):
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime != self._current[0]:
+                    # Only a successful load moves the stamp, so a broken
+                    # edit is retried at the next check
+                    self._current = (mtime, self._load())
+                    logger.info("Reloaded savings rules from %s", self.path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error("Keeping previous savings rules, failed to reload %s: %s", self.path, e)
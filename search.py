@@ -0,0 +1,33 @@
+"""Tokenising expense text for the per-user inverted index"""
+import re
+import unicodedata
+
+WORD = re.compile(r'\w+')
+
+# Cap on distinct terms indexed per expense, so a pasted essay of a
+# description cannot bloat the index
+MAX_TERMS = 64
+
+
+def tokenize(text):
+    """Case- and accent-folded words of ``text``, in order, without repeats"""
+    folded = text.casefold()
+    if not folded.isascii():
+        folded = unicodedata.normalize('NFKD', folded)
+        folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    return list(dict.fromkeys(WORD.findall(folded)))
+
+
+def matches(words, title, description):
+    """Whether every word is a prefix of some word of the expense's text"""
+    terms = expense_terms(title, description)
+    return all(any(term.startswith(word) for term in terms) for word in words)
+
+
+def expense_terms(title, description):
+    return tokenize(f'{title} {description}')[:MAX_TERMS]
+
+
+def prefix_range(prefix):
+    """Bounds [low, high) of the terms starting with ``prefix``"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
@@ -0,0 +1,88 @@
+"""Response serialisation: fast JSON encoding, sparse fieldsets and gzip"""
+import gzip
+import math
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+if orjson is not None:
+    # Same key order as the stdlib path; dates and dataclasses still go
+    # through Flask's default() so both encoders agree on them
+    ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                      | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+# Compression level for gzip bodies; 6 is zlib's usual speed/size balance
+GZIP_LEVEL = 6
+
+
+def _finite(obj):
+    """``obj`` with NaN and infinite floats replaced by None, as orjson encodes them"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding with orjson when it is installed.
+
+    The stdlib path is made to write what orjson does (compact, raw UTF-8
+    instead of \\u escapes, null for NaN and infinities) so a body, and the
+    ETag cached with it, does not depend on which encoder produced it.
+    """
+
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return self._stdlib_dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+
+    def dumps_bytes(self, obj, indent=False):
+        """Encode straight to UTF-8 bytes, compact or indented by two spaces"""
+        if orjson is None:
+            return self._stdlib_dumps(obj, **({'indent': 2} if indent else {})).encode()
+        option = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def response(self, *args, **kwargs):
+        """Like Flask's, but encoded by ``dumps_bytes`` so jsonify gets the fast path too"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+    def _stdlib_dumps(self, obj, **kwargs):
+        if 'indent' not in kwargs:
+            kwargs.setdefault('separators', (',', ':'))
+        try:
+            return super().dumps(obj, allow_nan=False, **kwargs)
+        except ValueError:
+            # Only non-finite floats are refused; encode them as orjson does
+            return super().dumps(_finite(obj), **kwargs)
+
+
+def parse_fields(value):
+    """Turn a ?fields=a,b,c value into a sorted tuple of names, or None to keep every field"""
+    if not value:
+        return None
+    fields = {name.strip() for name in value.split(',')}
+    fields.discard('')
+    return tuple(sorted(fields)) or None
+
+
+def select_fields(records, fields):
+    """Keep only ``fields`` in each record dict (all of them when ``fields`` is None)"""
+    if fields is None:
+        return records
+    return [{name: record[name] for name in fields if name in record} for record in records]
+
+
+def gzip_body(body):
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
@@ -4,6 +4,7 @@ let pastMonthData = [];
 let dailyTrendChart = null;
 let categoryChart = null;
 let comparisonChart = null;
+let events = null;
 
 // Initialize analytics dashboard
 document.addEventListener('DOMContentLoaded', async () => {
@@ -24,6 +25,12 @@ document.addEventListener('DOMContentLoaded', async () => {
         // Check if data exists and show debug panel if needed
         checkDataAndShowDebug();
         
+        // Redraw when past month data is regenerated, here or in another tab
+        if (window.EventSource) {
+            events = new EventSource('/api/events');
+            events.addEventListener('past-month-regenerated', refreshAnalytics);
+        }
+        
         console.log('Analytics dashboard initialized successfully');
     } catch (error) {
         console.error('Error initializing analytics dashboard:', error);
@@ -436,6 +443,16 @@ function toggleDebug() {
     }
 }
 
+// Reload the analytics data and redraw everything
+async function refreshAnalytics() {
+    await loadAnalyticsData();
+    await loadPastMonthData();
+    updateSummaryCards();
+    createCharts();
+    renderRecommendations();
+    renderUnnecessaryExpenses();
+}
+
 async function regeneratePastData() {
     try {
         showNotification('Regenerating past month data...', 'success');
@@ -449,13 +466,10 @@ async function regeneratePastData() {
         if (data.success) {
             showNotification(data.message, 'success');
             
-            // Reload the analytics data
-            await loadAnalyticsData();
-            await loadPastMonthData();
-            updateSummaryCards();
-            createCharts();
-            renderRecommendations();
-            renderUnnecessaryExpenses();
+            // Reload the analytics data, unless the event stream is about to
+            if (!events || events.readyState !== EventSource.OPEN) {
+                await refreshAnalytics();
+            }
             
             // Update debug info
             const debugInfo = document.getElementById('debugInfo');
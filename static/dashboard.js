@@ -3,36 +3,136 @@ let expenses = [];
 let categories = [];
 let stats = {};
 let categoryChart = null;
+let searchResults = null;
+let searchQuery = '';
+let searchTimer = null;
+let nextCursor = null;
+let searchCursor = null;
+let eventsConnected = false;
+let eventsReconnecting = false;
+let statsVersion = 0;
 
 // Initialize dashboard
 document.addEventListener('DOMContentLoaded', async () => {
-    await loadCategories();
-    await loadExpenses();
-    await loadStats();
+    await loadDashboard();
     setupEventListeners();
     setTodayDate();
+    subscribeToEvents();
 });
 
+// Follow changes made in other tabs and devices over /api/events instead of polling
+function subscribeToEvents() {
+    if (!window.EventSource) {
+        return;
+    }
+    
+    const source = new EventSource('/api/events');
+    
+    source.addEventListener('open', () => {
+        // Anything missed while disconnected is picked up by reloading
+        if (eventsReconnecting) {
+            loadDashboard();
+        }
+        eventsConnected = true;
+    });
+    
+    source.addEventListener('error', () => {
+        eventsConnected = false;
+        eventsReconnecting = true;
+    });
+    
+    source.addEventListener('expense-added', e => {
+        const expense = JSON.parse(e.data);
+        if (!expenses.some(existing => existing.id === expense.id)) {
+            expenses.push(expense);
+            renderExpenses();
+        }
+    });
+    
+    source.addEventListener('expense-deleted', e => {
+        const { id } = JSON.parse(e.data);
+        expenses = expenses.filter(expense => expense.id !== id);
+        if (searchResults !== null) {
+            searchResults = searchResults.filter(expense => expense.id !== id);
+        }
+        renderExpenses();
+    });
+    
+    source.addEventListener('stats', e => {
+        const data = JSON.parse(e.data);
+        if (data.version < statsVersion) {
+            return;  // an older update arriving after a newer one
+        }
+        statsVersion = data.version;
+        stats = data;
+        updateStatsDisplay();
+        updateCategoryChart();
+        renderExpenses();
+    });
+    
+    // Bulk changes and dropped events: reload rather than patch
+    source.addEventListener('expenses-changed', () => loadDashboard());
+    source.addEventListener('resync', () => loadDashboard());
+}
+
+// Load categories, recent expenses and stats in one request
+async function loadDashboard() {
+    try {
+        const response = await fetch('/api/dashboard');
+        
+        if (!response.ok) {
+            if (response.status === 401) {
+                throw new Error('Not authenticated. Please log in again.');
+            }
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        
+        categories = data.categories;
+        expenses = data.expenses;
+        nextCursor = data.next_cursor;
+        stats = data.stats;
+        
+        renderCategoryOptions();
+        renderExpenses();
+        updateStatsDisplay();
+        updateCategoryChart();
+    } catch (error) {
+        console.error('Error loading dashboard:', error);
+        showNotification('Failed to load dashboard: ' + error.message, 'error');
+        
+        // Fall back to the individual endpoints
+        await loadCategories();
+        await loadExpenses();
+        await loadStats();
+    }
+}
+
 // Load categories
 async function loadCategories() {
     try {
         const response = await fetch('/api/categories');
         categories = await response.json();
-        
-        const categorySelect = document.getElementById('expenseCategory');
-        categorySelect.innerHTML = '<option value="">Select Category</option>';
-        
-        categories.forEach(category => {
-            const option = document.createElement('option');
-            option.value = category;
-            option.textContent = category;
-            categorySelect.appendChild(option);
-        });
+        renderCategoryOptions();
     } catch (error) {
         showNotification('Failed to load categories', 'error');
     }
 }
 
+// Fill the category dropdown
+function renderCategoryOptions() {
+    const categorySelect = document.getElementById('expenseCategory');
+    categorySelect.innerHTML = '<option value="">Select Category</option>';
+    
+    categories.forEach(category => {
+        const option = document.createElement('option');
+        option.value = category;
+        option.textContent = category;
+        categorySelect.appendChild(option);
+    });
+}
+
 // Load expenses
 async function loadExpenses() {
     try {
@@ -59,6 +159,7 @@ async function loadExpenses() {
         }
         
         expenses = data;
+        nextCursor = null;
         renderExpenses();
         
         console.log('Expenses loaded successfully');
@@ -120,6 +221,30 @@ async function loadStats() {
     }
 }
 
+// Apply the stats_delta returned by an add or delete, instead of refetching /api/stats
+function applyStatsDelta(delta) {
+    const round = value => Math.round(value * 100) / 100;
+    
+    stats.total_spent = round((stats.total_spent || 0) + delta.total_spent);
+    stats.expense_count = (stats.expense_count || 0) + delta.expense_count;
+    stats.category_totals = stats.category_totals || {};
+    Object.entries(delta.category_totals).forEach(([category, amount]) => {
+        const total = round((stats.category_totals[category] || 0) + amount);
+        if (total > 0) {
+            stats.category_totals[category] = total;
+        } else {
+            delete stats.category_totals[category];
+        }
+    });
+    
+    const budget = stats.budget || 0;
+    stats.remaining = Math.max(0, budget - stats.total_spent);
+    stats.budget_used_percentage = budget > 0 ? Math.min(100, stats.total_spent / budget * 100) : 0;
+    
+    updateStatsDisplay();
+    updateCategoryChart();
+}
+
 // Update stats display
 function updateStatsDisplay() {
     document.getElementById('totalSpent').textContent = `₹${stats.total_spent?.toLocaleString('en-IN') || 0}`;
@@ -208,12 +333,82 @@ function updateCategoryChart() {
     });
 }
 
+// Fetch the next page of expenses (or search results) after the last one shown
+async function loadMoreExpenses() {
+    const searching = searchResults !== null;
+    const cursor = searching ? searchCursor : nextCursor;
+    if (!cursor) {
+        return;
+    }
+    
+    const url = searching
+        ? `/api/expenses/search?q=${encodeURIComponent(searchQuery)}&limit=50&after=${encodeURIComponent(cursor)}`
+        : `/api/expenses?limit=50&after=${encodeURIComponent(cursor)}`;
+    try {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const page = await response.json();
+        const following = response.headers.get('X-Next-Cursor');
+        if (searching) {
+            if (searchResults === null || cursor !== searchCursor) {
+                return;  // the search changed while this page was loading
+            }
+            searchResults = appendNew(searchResults, page);
+            searchCursor = following;
+        } else {
+            if (cursor !== nextCursor) {
+                return;  // the list was reloaded while this page was loading
+            }
+            expenses = appendNew(expenses, page);
+            nextCursor = following;
+        }
+        renderExpenses();
+    } catch (error) {
+        console.error('Error loading more expenses:', error);
+        showNotification('Failed to load more expenses', 'error');
+    }
+}
+
+// Append a page to a list, skipping expenses already in it (e.g. added here since)
+function appendNew(list, page) {
+    const seen = new Set(list.map(expense => expense.id));
+    return list.concat(page.filter(expense => !seen.has(expense.id)));
+}
+
+// Escape text for interpolation into HTML
+function escapeHtml(text) {
+    return String(text)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
 // Render expenses list
 function renderExpenses() {
     const expensesList = document.getElementById('expensesList');
     const expensesTotal = document.getElementById('expensesTotal');
+    const cursor = searchResults !== null ? searchCursor : nextCursor;
+    document.getElementById('loadMoreExpenses').style.display = cursor ? '' : 'none';
+    
+    if (searchResults !== null) {
+        expensesTotal.textContent = `Matches: ${searchResults.length}`;
+        if (searchResults.length === 0) {
+            expensesList.innerHTML = `
+            <div style="text-align: center; padding: 40px; color: #666;">
+                <p>No expenses match "${escapeHtml(searchQuery)}"</p>
+            </div>
+        `;
+            return;
+        }
+    }
+    
+    const shown = searchResults ?? expenses;
     
-    if (expenses.length === 0) {
+    if (shown.length === 0) {
         expensesList.innerHTML = `
             <div style="text-align: center; padding: 40px; color: #666;">
                 <i class="fas fa-receipt" style="font-size: 3rem; margin-bottom: 15px; opacity: 0.3;"></i>
@@ -225,17 +420,17 @@ function renderExpenses() {
         return;
     }
     
-    // Sort expenses by date (newest first)
-    const sortedExpenses = [...expenses].sort((a, b) => new Date(b.date) - new Date(a.date));
+    // Sort expenses by date (newest first); ISO dates order correctly as strings
+    const sortedExpenses = [...shown].sort((a, b) => (a.date < b.date) - (a.date > b.date));
     
     expensesList.innerHTML = sortedExpenses.map(expense => `
         <div class="expense-item">
             <div class="expense-info">
-                <div class="expense-title">${expense.title}</div>
+                <div class="expense-title">${escapeHtml(expense.title)}</div>
                 <div class="expense-details">
-                    <span class="expense-category">${expense.category}</span>
+                    <span class="expense-category">${escapeHtml(expense.category)}</span>
                     <span><i class="fas fa-calendar"></i> ${formatDate(expense.date)}</span>
-                    ${expense.description ? `<span><i class="fas fa-comment"></i> ${expense.description}</span>` : ''}
+                    ${expense.description ? `<span><i class="fas fa-comment"></i> ${escapeHtml(expense.description)}</span>` : ''}
                 </div>
             </div>
             <div class="expense-amount">₹${expense.amount.toLocaleString('en-IN')}</div>
@@ -247,7 +442,12 @@ function renderExpenses() {
         </div>
     `).join('');
     
-    const total = expenses.reduce((sum, expense) => sum + expense.amount, 0);
+    if (searchResults !== null) {
+        return;
+    }
+    
+    // Only the newest page is loaded, so the overall total comes from the stats
+    const total = stats.total_spent ?? expenses.reduce((sum, expense) => sum + expense.amount, 0);
     expensesTotal.textContent = `Total: ₹${total.toLocaleString('en-IN')}`;
 }
 
@@ -264,6 +464,38 @@ function formatDate(dateString) {
 // Setup event listeners
 function setupEventListeners() {
     document.getElementById('expenseForm').addEventListener('submit', addExpense);
+    document.getElementById('loadMoreExpenses').addEventListener('click', loadMoreExpenses);
+    document.getElementById('expenseSearch').addEventListener('input', e => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => searchExpenses(e.target.value.trim()), 200);
+    });
+}
+
+// Search expenses by title and description prefixes
+async function searchExpenses(query) {
+    searchQuery = query;
+    if (!query) {
+        searchResults = null;
+        searchCursor = null;
+        renderExpenses();
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/expenses/search?q=${encodeURIComponent(query)}&limit=50`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const results = await response.json();
+        if (query !== searchQuery) {
+            return;  // a newer query has been typed since
+        }
+        searchResults = results;
+        searchCursor = response.headers.get('X-Next-Cursor');
+        renderExpenses();
+    } catch (error) {
+        console.error('Error searching expenses:', error);
+    }
 }
 
 // Set today's date as default
@@ -323,15 +555,22 @@ async function addExpense(e) {
         const responseData = await response.json();
         
         if (response.ok && responseData.id) {
-            expenses.push(responseData);
+            const { stats_delta: statsDelta, ...expense } = responseData;
+            expenses.push(expense);
             
             // Reset form
             document.getElementById('expenseForm').reset();
             setTodayDate();
             
-            // Refresh data
-            await loadStats();
-            renderExpenses();
+            // Refresh data; with a live event stream the stats event brings the new totals
+            if (!eventsConnected) {
+                applyStatsDelta(statsDelta);
+            }
+            if (searchQuery) {
+                searchExpenses(searchQuery);
+            } else {
+                renderExpenses();
+            }
             
             showNotification('Expense added successfully!', 'success');
         } else {
@@ -356,10 +595,16 @@ async function deleteExpense(expenseId) {
         });
         
         if (response.ok) {
+            const responseData = await response.json();
             expenses = expenses.filter(expense => expense.id !== expenseId);
+            if (searchResults !== null) {
+                searchResults = searchResults.filter(expense => expense.id !== expenseId);
+            }
             
-            // Refresh data
-            await loadStats();
+            // Refresh data; with a live event stream the stats event brings the new totals
+            if (!eventsConnected) {
+                applyStatsDelta(responseData.stats_delta);
+            }
             renderExpenses();
             
             showNotification('Expense deleted successfully!', 'success');
@@ -0,0 +1,1064 @@
+"""SQLite-backed storage for users, expenses and past month data"""
+import logging
+import math
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from records import ExpenseColumns, decode_amount, encode_day, encode_id
+from rollups import DailyRollup
+from search import expense_terms, matches, prefix_range, tokenize
+
+logger = logging.getLogger('expense_tracker.storage')
+
+USER_COLUMNS = 'id, email, password, name, monthly_budget'
+EXPENSE_COLUMNS = 'id, title, amount, category_code, day, description'
+
+
+def _legacy_day(value):
+    """Day ordinal of a date stored before dates were validated, or None if it is unreadable"""
+    try:
+        return encode_day(value)
+    except ValueError:
+        pass
+    try:
+        # Unpadded dates such as 2026-1-5 were once accepted
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date().toordinal()
+    except ValueError:
+        return None
+
+
+def _compact_expenses(conn):
+    """Store ids as 16-byte blobs, dates as day ordinals and categories as codes"""
+    conn.execute('CREATE TABLE categories (code INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    for table in ('expenses', 'past_expenses'):
+        conn.execute(f"""
+            CREATE TABLE {table}_compact (
+                id BLOB PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                amount NUMERIC NOT NULL,
+                category_code INTEGER NOT NULL,
+                day INTEGER NOT NULL,
+                description TEXT NOT NULL DEFAULT ''
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f'INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM {table}')
+        codes = {row['name']: row['code'] for row in conn.execute('SELECT code, name FROM categories')}
+        rows = []
+        skipped = 0
+        for row in conn.execute(f'SELECT * FROM {table}').fetchall():
+            day = _legacy_day(row['date'])
+            if day is None:
+                skipped += 1
+                continue
+            rows.append((encode_id(row['id']), row['user_id'], row['title'], row['amount'],
+                         codes[row['category']], day, row['description']))
+        conn.executemany(f'INSERT INTO {table}_compact VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        if skipped:
+            logger.warning("Dropped %d %s rows with unreadable dates", skipped, table)
+            if table == 'expenses':
+                # The running totals were built from every row, including these
+                conn.execute('DELETE FROM expense_totals')
+                conn.execute("""
+                    INSERT INTO expense_totals
+                        SELECT e.user_id, c.name, SUM(e.amount), COUNT(*)
+                        FROM expenses_compact e JOIN categories c ON c.code = e.category_code
+                        GROUP BY e.user_id, c.name
+                """)
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_compact RENAME TO {table}')
+        conn.execute(f'CREATE INDEX idx_{table}_user_day ON {table} (user_id, day)')
+        conn.execute(f'CREATE INDEX idx_{table}_user_category ON {table} (user_id, category_code)')
+
+
+def _index_expense_terms(conn):
+    """Build the inverted index of title and description words for current expenses"""
+    conn.execute("""
+        CREATE TABLE expense_terms (
+            user_id TEXT NOT NULL,
+            term TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            expense_id BLOB NOT NULL,
+            PRIMARY KEY (user_id, term, day, expense_id)
+        ) WITHOUT ROWID
+    """)
+    conn.executemany(
+        'INSERT INTO expense_terms (user_id, term, day, expense_id) VALUES (?, ?, ?, ?)',
+        _postings(conn.execute('SELECT id, user_id, title, day, description FROM expenses').fetchall()),
+    )
+
+
+def _postings(rows):
+    for row in rows:
+        for term in expense_terms(row['title'], row['description']):
+            yield row['user_id'], term, row['day'], row['id']
+
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Entries are either SQL scripts or callables taking the connection.
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        email TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        name TEXT,
+        monthly_budget NUMERIC NOT NULL DEFAULT 30000
+    );
+
+    CREATE TABLE IF NOT EXISTS expenses (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        title TEXT NOT NULL,
+        amount NUMERIC NOT NULL,
+        category TEXT NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user_id, date);
+    CREATE INDEX IF NOT EXISTS idx_expenses_user_category ON expenses (user_id, category);
+
+    CREATE TABLE IF NOT EXISTS past_expenses (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        title TEXT NOT NULL,
+        amount NUMERIC NOT NULL,
+        category TEXT NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS idx_past_expenses_user_date ON past_expenses (user_id, date);
+    CREATE INDEX IF NOT EXISTS idx_past_expenses_user_category ON past_expenses (user_id, category);
+    """,
+    # Cluster users on id so resolving a session's user_id is a single b-tree seek
+    """
+    CREATE TABLE users_by_id (
+        id TEXT PRIMARY KEY,
+        email TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        name TEXT,
+        monthly_budget NUMERIC NOT NULL DEFAULT 30000
+    ) WITHOUT ROWID;
+    INSERT INTO users_by_id SELECT id, email, password, name, monthly_budget FROM users;
+    DROP TABLE users;
+    ALTER TABLE users_by_id RENAME TO users;
+    """,
+    # Key expenses by id so a delete is one seek; the (user_id, date) index
+    # carries the id too, giving a stable date order for listing
+    """
+    CREATE TABLE expenses_by_id (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        title TEXT NOT NULL,
+        amount NUMERIC NOT NULL,
+        category TEXT NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT ''
+    ) WITHOUT ROWID;
+    INSERT INTO expenses_by_id SELECT id, user_id, title, amount, category, date, description FROM expenses;
+    DROP TABLE expenses;
+    ALTER TABLE expenses_by_id RENAME TO expenses;
+    CREATE INDEX idx_expenses_user_date ON expenses (user_id, date);
+    CREATE INDEX idx_expenses_user_category ON expenses (user_id, category);
+    """,
+    # Running per-user, per-category aggregates maintained on every write
+    """
+    CREATE TABLE expense_totals (
+        user_id TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total NUMERIC NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, category)
+    ) WITHOUT ROWID;
+    INSERT INTO expense_totals
+        SELECT user_id, category, SUM(amount), COUNT(*) FROM expenses GROUP BY user_id, category;
+    """,
+    _compact_expenses,
+    # Per-user version counter, bumped by every write to that user's data
+    """
+    CREATE TABLE data_versions (
+        user_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    """,
+    # Per-user daily per-category aggregates backing date-range totals
+    """
+    CREATE TABLE expense_daily_totals (
+        user_id TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        category_code INTEGER NOT NULL,
+        total NUMERIC NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, day, category_code)
+    ) WITHOUT ROWID;
+    INSERT INTO expense_daily_totals
+        SELECT user_id, day, category_code, SUM(amount), COUNT(*) FROM expenses
+        GROUP BY user_id, day, category_code;
+    """,
+    _index_expense_terms,
+    # Secondary indexes for structured queries: amount ranges, and category
+    # lookups that also narrow by date
+    """
+    CREATE INDEX idx_expenses_user_amount ON expenses (user_id, amount);
+    DROP INDEX idx_expenses_user_category;
+    CREATE INDEX idx_expenses_user_category_day ON expenses (user_id, category_code, day);
+    """,
+]
+
+# Users whose daily rollups are kept in memory
+ROLLUP_CACHE_USERS = 256
+
+# RETURNING clauses need SQLite 3.35
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+# Writer locks shared out among users by hash
+USER_LOCK_STRIPES = 64
+
+# Message prefix of a users.email or users.id uniqueness violation
+DUPLICATE_USER_ERROR = 'UNIQUE constraint failed: users.'
+
+# Most distinct words a search prefix is merged over (SQLite allows 500
+# arms in a compound SELECT); a broader prefix's postings are sorted whole
+MAX_SEARCH_TERMS = 400
+
+# A structured query filter matching fewer rows than this reads its index
+# range and sorts it; if every filter is broader, the date order is walked
+QUERY_SORT_LIMIT = 2000
+
+# Another filter's index is intersected in only while it matches no more
+# than this many times the driving filter's rows
+QUERY_INTERSECT_RATIO = 8
+
+# A search word with fewer postings than this has its matches read and
+# sorted up front instead of streamed newest first
+SEARCH_SORT_LIMIT = 2000
+
+
+class AggregateMismatch(AssertionError):
+    """Raised in verify mode when the running totals disagree with the rows"""
+
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+def _fold_totals(rows):
+    category_totals = {row['category']: row['total'] for row in rows}
+    return sum(category_totals.values()), sum(row['count'] for row in rows), category_totals
+
+
+def _totals_match(actual, expected):
+    (total, count, categories), (expected_total, expected_count, expected_categories) = actual, expected
+    return (
+        count == expected_count
+        and math.isclose(total, expected_total, abs_tol=1e-6)
+        and categories.keys() == expected_categories.keys()
+        and all(math.isclose(categories[c], expected_categories[c], abs_tol=1e-6) for c in categories)
+    )
+
+
+class Store:
+    """Durable store for the app's data.
+
+    Connections are pooled and pinned to the calling thread until
+    ``release()`` is called (the app does this at the end of every request),
+    so a request reuses one connection and its prepared statement cache.
+
+    With ``verify_totals`` set, every read of the running expense totals is
+    checked against a full recomputation (meant for tests).
+
+    Expense reads come back as ``ExpenseColumns`` batches. Category names are
+    stored as codes; ``categories`` are registered first so they get the
+    lowest ones.
+
+    Row counts for each table are counted once at startup and then kept up
+    to date by the writes themselves (see ``sizes()``).
+
+    Date-range totals come from in-memory Fenwick trees over the daily
+    aggregates, patched after each commit and rebuilt from the table when
+    they fall behind the user's data version.
+
+    Writes to one user's data serialise on a striped lock held through the
+    commit, so they queue in-process instead of spinning in SQLite's busy
+    handler and their post-commit patches land in order. Readers take no
+    locks: each read builds its own result from a consistent snapshot, and
+    the shared category maps are replaced, never mutated.
+    """
+
+    def __init__(self, path, pool_size=8, verify_totals=False, categories=()):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(f'SQLite 3.35 or later is required, found {sqlite3.sqlite_version}')
+        self.path = path
+        self.verify_totals = verify_totals
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._local = threading.local()
+        self._category_codes = {}
+        self._category_names = {}
+        self._categories_lock = threading.Lock()
+        self._user_locks = [threading.RLock() for _ in range(USER_LOCK_STRIPES)]
+        self._sizes_lock = threading.Lock()
+        self._rollups = OrderedDict()
+        self._rollups_lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._migrate()
+        self._load_categories()
+        self._ensure_categories(categories)
+        self._sizes = {
+            table: self.conn.execute(f'SELECT COUNT(*) AS n FROM {table}').fetchone()['n']
+            for table in ('users', 'expenses', 'past_expenses')
+        }
+        self.release()
+
+    # Connection handling
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.row_factory = _dict_row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute('PRAGMA cache_size=-8000')
+        return conn
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Return this thread's connection to the pool"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _user_locks_for(self, user_ids):
+        """Writer locks covering ``user_ids``, in stripe order so every caller takes them in the same order"""
+        stripes = sorted({hash(user_id) % USER_LOCK_STRIPES for user_id in user_ids})
+        return [self._user_locks[stripe] for stripe in stripes]
+
+    @contextmanager
+    def transaction(self, *user_ids):
+        """Run a block in a write transaction, holding the writer locks of ``user_ids``.
+
+        Nested use joins the enclosing transaction, so a caller can group
+        several store writes into one commit. Writer locks are always taken
+        before SQLite's write lock, so a block writing a user's data must
+        name that user at the outermost level; a nested block needing a
+        writer lock the enclosing one does not hold raises RuntimeError
+        rather than risk a deadlock.
+        """
+        conn = self.conn
+        locks = self._user_locks_for(user_ids)
+        if conn.in_transaction:
+            held = self._local.held_locks
+            if not all(any(lock is other for other in held) for lock in locks):
+                raise RuntimeError(
+                    f'transaction for {", ".join(map(str, user_ids))} nested in one not holding its writer locks'
+                )
+            yield conn
+            return
+        held = self._local.held_locks = []
+        try:
+            for lock in locks:
+                lock.acquire()
+                held.append(lock)
+            conn.execute('BEGIN IMMEDIATE')
+            self._local.size_deltas = {}
+            self._local.after_commit = []
+            self._local.new_categories = {}
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                deltas, self._local.size_deltas = self._local.size_deltas, None
+                callbacks, self._local.after_commit = self._local.after_commit, None
+                new_categories, self._local.new_categories = self._local.new_categories, None
+            conn.commit()
+            with self._sizes_lock:
+                for table, delta in deltas.items():
+                    self._sizes[table] += delta
+            if new_categories:
+                self._publish_categories(new_categories)
+            for callback in callbacks:
+                callback()
+        finally:
+            self._local.held_locks = None
+            for lock in reversed(held):
+                lock.release()
+
+    def _count_rows(self, table, delta):
+        """Record a row-count change, applied to ``sizes()`` once the transaction commits"""
+        deltas = self._local.size_deltas
+        deltas[table] = deltas.get(table, 0) + delta
+
+    def sizes(self):
+        """Committed row counts for users, expenses and past_expenses, without scanning"""
+        with self._sizes_lock:
+            return dict(self._sizes)
+
+    def _migrate(self):
+        with self.transaction() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()['user_version']
+            for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                if callable(script):
+                    script(conn)
+                else:
+                    for statement in script.split(';'):
+                        if statement.strip():
+                            conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {number}')
+
+    # Category codes
+
+    def _publish_categories(self, codes):
+        """Add committed {name: code} entries to the shared maps"""
+        # Copy on write: readers keep using whichever complete map they already hold
+        with self._categories_lock:
+            names = dict(self._category_names)
+            by_name = dict(self._category_codes)
+            for name, code in codes.items():
+                names[code] = name
+                by_name[name] = code
+            self._category_names = names
+            self._category_codes = by_name
+
+    def _load_categories(self):
+        rows = self.conn.execute('SELECT code, name FROM categories').fetchall()
+        # Inside a transaction this connection also sees the categories it
+        # has registered but not committed; those are published on commit
+        uncommitted = getattr(self._local, 'new_categories', None) or {}
+        self._publish_categories({
+            row['name']: row['code'] for row in rows if row['name'] not in uncommitted
+        })
+
+    def _ensure_categories(self, names):
+        """Return {name: code} for the given category names, registering new ones.
+
+        New codes join the shared maps only once the registering
+        transaction commits, so no other thread can store a code that might
+        still be rolled back. Codes are never reused.
+        """
+        codes = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            code = self._category_codes.get(name)
+            if code is None:
+                missing.append(name)
+            else:
+                codes[name] = code
+        if not missing:
+            return codes
+        with self.transaction() as conn:
+            conn.executemany('INSERT OR IGNORE INTO categories (name) VALUES (?)', [(name,) for name in missing])
+            rows = conn.execute(
+                f'SELECT code, name FROM categories WHERE name IN ({", ".join("?" * len(missing))})', missing
+            ).fetchall()
+            registered = {row['name']: row['code'] for row in rows}
+            self._local.new_categories.update(
+                (name, code) for name, code in registered.items() if name not in self._category_codes
+            )
+        codes.update(registered)
+        return codes
+
+    def _category_names_in_transaction(self):
+        """The shared code-to-name map plus any codes this transaction has registered"""
+        new_categories = getattr(self._local, 'new_categories', None)
+        if not new_categories:
+            return self._category_names
+        return {**self._category_names, **{code: name for name, code in new_categories.items()}}
+
+    def _category_name(self, code):
+        if code not in self._category_names:
+            self._load_categories()
+        return self._category_names_in_transaction()[code]
+
+    def _encode_expenses(self, user_id, items):
+        codes = self._ensure_categories(item['category'] for item in items)
+        return [
+            (encode_id(item['id']), user_id, item['title'], item['amount'],
+             codes[item['category']], encode_day(item['date']), item['description'])
+            for item in items
+        ]
+
+    def _columns(self, sql, params):
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        columns = ExpenseColumns(self._category_names)
+        append = columns.append
+        for row in cursor.execute(sql, params):
+            append(*row)
+        if not self._category_names.keys() >= set(columns.codes):
+            self._load_categories()
+            columns.category_names = self._category_names_in_transaction()
+        return columns
+
+    # Users
+
+    def get_user_by_email(self, email):
+        return self.conn.execute(
+            f'SELECT {USER_COLUMNS} FROM users WHERE email = ?', (email,)
+        ).fetchone()
+
+    def get_user_by_id(self, user_id):
+        """Resolve a user id (e.g. session['user_id']) via the primary key"""
+        return self.conn.execute(
+            f'SELECT {USER_COLUMNS} FROM users WHERE id = ?', (user_id,)
+        ).fetchone()
+
+    def create_user(self, user):
+        """Insert a user, returning False if the email (or id) is already registered.
+
+        Other constraint failures, such as a missing password, raise
+        sqlite3.IntegrityError.
+        """
+        try:
+            self.create_users([user])
+        except sqlite3.IntegrityError as e:
+            # Matched on the message: the error code attributes need Python 3.11
+            if str(e).startswith(DUPLICATE_USER_ERROR):
+                return False
+            raise
+        return True
+
+    def create_users(self, items):
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO users (id, email, password, name, monthly_budget) '
+                'VALUES (:id, :email, :password, :name, :monthly_budget)',
+                items,
+            )
+            self._count_rows('users', len(items))
+
+    def count_users(self):
+        return self.sizes()['users']
+
+    # Current expenses
+
+    def list_expenses(self, user_id):
+        return self._columns(
+            f'SELECT {EXPENSE_COLUMNS} FROM expenses WHERE user_id = ? ORDER BY day, id',
+            (user_id,),
+        )
+
+    def list_expenses_page(self, user_id, limit, after=None):
+        """Return up to ``limit`` expenses newest first, starting below the (date, id) ``after``
+
+        Raises ValueError if ``after`` is malformed.
+        """
+        if after is None:
+            return self._columns(
+                f'SELECT {EXPENSE_COLUMNS} FROM expenses WHERE user_id = ? '
+                'ORDER BY day DESC, id DESC LIMIT ?',
+                (user_id, limit),
+            )
+        return self._columns(
+            f'SELECT {EXPENSE_COLUMNS} FROM expenses WHERE user_id = ? AND (day, id) < (?, ?) '
+            'ORDER BY day DESC, id DESC LIMIT ?',
+            (user_id, encode_day(after[0]), encode_id(after[1]), limit),
+        )
+
+    def iter_expenses(self, user_id, past=False, start=None, end=None, category=None, chunk_size=1000):
+        """Yield a user's expenses oldest first as ``ExpenseColumns`` chunks.
+
+        ``start`` and ``end`` are inclusive YYYY-MM-DD bounds and ``category``
+        a category name. Each chunk is its own keyset query on (day, id), so
+        no read transaction or result set is held open between chunks.
+        Raises ValueError if a bound is malformed.
+        """
+        table = 'past_expenses' if past else 'expenses'
+        clauses = ['user_id = ?']
+        params = [user_id]
+        if start is not None:
+            clauses.append('day >= ?')
+            params.append(encode_day(start))
+        if end is not None:
+            clauses.append('day <= ?')
+            params.append(encode_day(end))
+        if category is not None:
+            code = self._category_codes.get(category)
+            if code is None:
+                return
+            clauses.append('category_code = ?')
+            params.append(code)
+        where = ' AND '.join(clauses)
+        after = ()
+        while True:
+            chunk = self._columns(
+                f'SELECT {EXPENSE_COLUMNS} FROM {table} WHERE {where}'
+                f'{" AND (day, id) > (?, ?)" if after else ""} ORDER BY day, id LIMIT ?',
+                (*params, *after, chunk_size),
+            )
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            after = (chunk.days[-1], bytes(chunk.ids[-16:]))
+
+    def _count_postings(self, user_id, prefix, limit):
+        """Postings of terms starting with ``prefix``, counted no further than ``limit``"""
+        return self.conn.execute(
+            'SELECT COUNT(*) AS n FROM (SELECT 1 FROM expense_terms'
+            ' WHERE user_id = ? AND term >= ? AND term < ? LIMIT ?)',
+            (user_id, *prefix_range(prefix), limit),
+        ).fetchone()['n']
+
+    def _terms_with_prefix(self, user_id, prefix, limit):
+        """Up to ``limit`` distinct indexed terms of the user's starting with ``prefix``"""
+        low, high = prefix_range(prefix)
+        terms = []
+        statement = 'SELECT term FROM expense_terms WHERE user_id = ? AND term >= ? AND term < ? ORDER BY term LIMIT 1'
+        while len(terms) < limit:
+            # Skip-scan: one index seek per distinct term, not one step per posting
+            row = self.conn.execute(statement, (user_id, low, high)).fetchone()
+            if row is None:
+                break
+            terms.append(row['term'])
+            low = row['term'] + '\x00'
+        return terms
+
+    def search_expenses(self, user_id, query, limit, after=None):
+        """Return up to ``limit`` expenses matching every word of ``query``, newest first.
+
+        A query word matches any indexed title or description word it is a
+        prefix of. Candidates come from the postings of a single word and
+        are checked against the other words on the rows themselves, so a
+        search reads index entries, never the user's whole expense table.
+        When every word is common the candidates stream newest first, by
+        merging the date-ordered index ranges of the terms the longest word
+        expands to, and reading stops at ``limit``; a word expanding to too
+        many terms to merge has its whole index range read and sorted
+        instead. ``after`` is a (date, id) keyset cursor as in
+        ``list_expenses_page``. Raises ValueError if it is malformed.
+        """
+        words = tokenize(query)
+        if not words:
+            return ExpenseColumns(self._category_names)
+        bound = () if after is None else (encode_day(after[0]), encode_id(after[1]))
+        keyset = '' if after is None else ' AND (day, expense_id) < (?, ?)'
+
+        # Drive from the word with the fewest postings. A rare one is read
+        # whole and sorted; if every word is common, stream the newest-first
+        # merge of the longest word's terms and stop at ``limit``.
+        estimates = {word: self._count_postings(user_id, word, SEARCH_SORT_LIMIT) for word in words}
+        driver = min(words, key=lambda word: (estimates[word], -len(word)))
+        if estimates[driver] == 0:
+            return ExpenseColumns(self._category_names)
+        terms = None
+        if estimates[driver] >= SEARCH_SORT_LIMIT:
+            driver = max(words, key=len)
+            terms = self._terms_with_prefix(user_id, driver, MAX_SEARCH_TERMS + 1)
+        postings = self.conn.cursor()
+        postings.row_factory = None
+        if terms is None or len(terms) > MAX_SEARCH_TERMS:
+            postings.execute(
+                'SELECT DISTINCT day, expense_id FROM expense_terms'
+                f' WHERE user_id = ? AND term >= ? AND term < ?{keyset} ORDER BY 1 DESC, 2 DESC',
+                (user_id, *prefix_range(driver), *bound),
+            )
+        else:
+            arm = f'SELECT day, expense_id FROM expense_terms WHERE user_id = ? AND term = ?{keyset}'
+            postings.execute(
+                f"{' UNION '.join([arm] * len(terms))} ORDER BY 1 DESC, 2 DESC",
+                [param for term in terms for param in (user_id, term, *bound)],
+            )
+
+        results = ExpenseColumns(self._category_names)
+        others = [word for word in words if word != driver]
+        batch_size = limit if not others else max(limit, 64)
+        while len(results) < limit:
+            batch = [expense_id for _, expense_id in postings.fetchmany(batch_size)]
+            if not batch:
+                break
+            rows = {
+                row['id']: row for row in self.conn.execute(
+                    f'SELECT {EXPENSE_COLUMNS} FROM expenses WHERE id IN ({", ".join("?" * len(batch))})',
+                    batch,
+                )
+            }
+            for expense_id in batch:
+                row = rows.get(expense_id)
+                if row is None or (others and not matches(others, row['title'], row['description'])):
+                    continue
+                results.append(row['id'], row['title'], row['amount'], row['category_code'],
+                               row['day'], row['description'])
+                if len(results) == limit:
+                    break
+        postings.close()
+        if not self._category_names.keys() >= set(results.codes):
+            self._load_categories()
+            results.category_names = self._category_names_in_transaction()
+        return results
+
+    def plan_query(self, user_id, categories=None, min_amount=None, max_amount=None, start=None, end=None):
+        """Choose the indexes answering a structured expense query.
+
+        Returns (driver, intersect, predicates): the index to read, the
+        other indexes whose id sets to intersect with it, and each
+        candidate index's (SQL, params) predicate. Every filtered index's
+        range is counted, stopping at ``QUERY_SORT_LIMIT``; the smallest
+        drives, and other selective ones no more than
+        ``QUERY_INTERSECT_RATIO`` times larger are intersected. With no selective filter, the date-ordered
+        index drives so reading can stop at the page limit. ``categories``
+        must be known category codes. Raises ValueError if a date is
+        malformed.
+        """
+        dates, date_params = [], []
+        if start is not None:
+            dates.append('day >= ?')
+            date_params.append(encode_day(start))
+        if end is not None:
+            dates.append('day <= ?')
+            date_params.append(encode_day(end))
+        predicates = {}
+        if dates:
+            predicates['idx_expenses_user_day'] = (dates, date_params)
+        amounts, amount_params = [], []
+        if min_amount is not None:
+            amounts.append('amount >= ?')
+            amount_params.append(min_amount)
+        if max_amount is not None:
+            amounts.append('amount <= ?')
+            amount_params.append(max_amount)
+        if amounts:
+            predicates['idx_expenses_user_amount'] = (amounts, amount_params)
+        if categories is not None:
+            predicates['idx_expenses_user_category_day'] = (
+                [f'category_code IN ({", ".join("?" * len(categories))})', *dates],
+                [*categories, *date_params],
+            )
+        predicates = {
+            index: (' AND '.join(['user_id = ?', *clauses]), [user_id, *params])
+            for index, (clauses, params) in predicates.items()
+        }
+
+        estimates = {
+            index: self.conn.execute(
+                f'SELECT COUNT(*) AS n FROM (SELECT 1 FROM expenses INDEXED BY {index} WHERE {where} LIMIT ?)',
+                (*params, QUERY_SORT_LIMIT),
+            ).fetchone()['n']
+            for index, (where, params) in predicates.items()
+        }
+        driver = min(estimates, key=estimates.get, default=None)
+        if driver is None or estimates[driver] >= QUERY_SORT_LIMIT:
+            # Nothing selective: walk newest first, in one category's date
+            # order when that is all that is asked for
+            if categories is not None and len(categories) == 1:
+                return 'idx_expenses_user_category_day', [], predicates
+            predicates.setdefault('idx_expenses_user_day', ('user_id = ?', [user_id]))
+            return 'idx_expenses_user_day', [], predicates
+        covered = {driver}
+        if driver == 'idx_expenses_user_category_day':
+            covered.add('idx_expenses_user_day')  # its range already narrows by date
+        intersect = [
+            index for index, estimate in estimates.items()
+            if index not in covered and estimate < QUERY_SORT_LIMIT
+            and estimate <= max(estimates[driver], 1) * QUERY_INTERSECT_RATIO
+        ]
+        return driver, intersect, predicates
+
+    def query_expenses(self, user_id, limit, categories=None, min_amount=None, max_amount=None,
+                       start=None, end=None, after=None):
+        """Return up to ``limit`` expenses matching every given filter, newest first.
+
+        ``categories`` is a collection of category names, ``min_amount`` and
+        ``max_amount`` inclusive amount bounds and ``start`` and ``end``
+        inclusive YYYY-MM-DD bounds. The index read is chosen by
+        ``plan_query``. ``after`` is a (date, id) keyset cursor as in
+        ``list_expenses_page``. Raises ValueError if a date or the cursor is
+        malformed.
+        """
+        if categories is not None:
+            categories = sorted({self._category_codes[name] for name in categories if name in self._category_codes})
+            if not categories:
+                return ExpenseColumns(self._category_names)
+        driver, intersect, predicates = self.plan_query(
+            user_id, categories, min_amount, max_amount, start, end
+        )
+        clauses, params = [], []
+        for where, where_params in predicates.values():
+            clauses.append(where)
+            params.extend(where_params)
+        for index in intersect:
+            where, where_params = predicates[index]
+            clauses.append(f'id IN (SELECT id FROM expenses INDEXED BY {index} WHERE {where})')
+            params.extend(where_params)
+        if after is not None:
+            clauses.append('(day, id) < (?, ?)')
+            params.extend((encode_day(after[0]), encode_id(after[1])))
+        return self._columns(
+            f'SELECT {EXPENSE_COLUMNS} FROM expenses INDEXED BY {driver} WHERE {" AND ".join(clauses)} '
+            'ORDER BY day DESC, id DESC LIMIT ?',
+            (*params, limit),
+        )
+
+    def count_expenses(self, user_id):
+        return self.expense_totals(user_id)[1]
+
+    def add_expenses(self, user_id, items):
+        deltas = {}
+        for item in items:
+            total, count = deltas.get(item['category'], (0, 0))
+            deltas[item['category']] = (total + item['amount'], count + 1)
+        rows = self._encode_expenses(user_id, items)
+        daily = {}
+        for _, _, _, amount, code, day, _ in rows:
+            total, count = daily.get((day, code), (0, 0))
+            daily[day, code] = (total + amount, count + 1)
+        with self.transaction(user_id) as conn:
+            conn.executemany(
+                'INSERT INTO expenses (id, user_id, title, amount, category_code, day, description) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+            self._count_rows('expenses', len(rows))
+            conn.executemany(
+                'INSERT INTO expense_terms (user_id, term, day, expense_id) VALUES (?, ?, ?, ?)',
+                [(user_id, term, day, raw_id)
+                 for raw_id, _, title, _, _, day, description in rows
+                 for term in expense_terms(title, description)],
+            )
+            self._apply_totals(conn, user_id, deltas)
+            self._apply_daily_totals(conn, user_id, daily)
+            self._bump_version(conn, user_id, daily)
+
+    def add_expense(self, user_id, expense):
+        self.add_expenses(user_id, [expense])
+
+    def delete_expense(self, user_id, expense_id):
+        """Delete one expense, returning its (category, amount), or None if it did not exist"""
+        return self.delete_expenses(user_id, [expense_id])[0]
+
+    def delete_expenses(self, user_id, expense_ids):
+        """Delete expenses in one transaction.
+
+        Returns the (category, amount) of each deleted expense, or None for
+        ids that did not exist.
+        """
+        found = []
+        deltas = {}
+        daily = {}
+        postings = []
+        with self.transaction(user_id) as conn:
+            for expense_id in expense_ids:
+                try:
+                    raw_id = encode_id(expense_id)
+                except ValueError:
+                    found.append(None)
+                    continue
+                row = conn.execute(
+                    'DELETE FROM expenses WHERE id = ? AND user_id = ? '
+                    'RETURNING category_code, amount, day, title, description',
+                    (raw_id, user_id),
+                ).fetchone()
+                if row is None:
+                    found.append(None)
+                else:
+                    category = self._category_name(row['category_code'])
+                    found.append((category, decode_amount(float(row['amount']))))
+                    total, count = deltas.get(category, (0, 0))
+                    deltas[category] = (total - row['amount'], count - 1)
+                    key = (row['day'], row['category_code'])
+                    total, count = daily.get(key, (0, 0))
+                    daily[key] = (total - row['amount'], count - 1)
+                    postings.extend(
+                        (user_id, term, row['day'], raw_id)
+                        for term in expense_terms(row['title'], row['description'])
+                    )
+            if deltas:
+                conn.executemany(
+                    'DELETE FROM expense_terms WHERE user_id = ? AND term = ? AND day = ? AND expense_id = ?',
+                    postings,
+                )
+                self._count_rows('expenses', -sum(1 for item in found if item is not None))
+                self._apply_totals(conn, user_id, deltas)
+                self._apply_daily_totals(conn, user_id, daily)
+                self._bump_version(conn, user_id, daily)
+        return found
+
+    def _bump_version(self, conn, user_id, daily=None):
+        """Bump the user's data version, patching their cached rollup with ``daily`` once committed"""
+        version = conn.execute(
+            'INSERT INTO data_versions (user_id, version) VALUES (?, 1) '
+            'ON CONFLICT (user_id) DO UPDATE SET version = version + 1 RETURNING version',
+            (user_id,),
+        ).fetchone()['version']
+        self._local.after_commit.append(lambda: self._patch_rollup(user_id, version, daily or {}))
+
+    def data_version(self, user_id):
+        """Counter that changes whenever any of the user's expense data changes"""
+        row = self.conn.execute(
+            'SELECT version FROM data_versions WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        return row['version'] if row else 0
+
+    def _apply_totals(self, conn, user_id, deltas):
+        """Fold {category: (amount, count)} deltas into the running totals"""
+        conn.executemany(
+            'INSERT INTO expense_totals (user_id, category, total, count) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (user_id, category) DO UPDATE SET '
+            'total = total + excluded.total, count = count + excluded.count',
+            [(user_id, category, total, count) for category, (total, count) in deltas.items()],
+        )
+        conn.execute('DELETE FROM expense_totals WHERE user_id = ? AND count <= 0', (user_id,))
+
+    def _apply_daily_totals(self, conn, user_id, deltas):
+        """Fold {(day, category code): (amount, count)} deltas into the daily aggregates"""
+        conn.executemany(
+            'INSERT INTO expense_daily_totals (user_id, day, category_code, total, count) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (user_id, day, category_code) DO UPDATE SET '
+            'total = total + excluded.total, count = count + excluded.count',
+            [(user_id, day, code, total, count) for (day, code), (total, count) in deltas.items()],
+        )
+        if any(count < 0 for _, count in deltas.values()):
+            conn.execute('DELETE FROM expense_daily_totals WHERE user_id = ? AND count <= 0', (user_id,))
+
+    def _patch_rollup(self, user_id, version, daily):
+        with self._rollups_lock:
+            rollup = self._rollups.get(user_id)
+            if rollup is None:
+                return
+            if rollup.version != version - 1 or not rollup.covers(daily):
+                del self._rollups[user_id]
+                return
+            for (day, code), (total, count) in daily.items():
+                rollup.add(day, code, total, count)
+            rollup.version = version
+
+    def _rollup(self, user_id):
+        with self._rollups_lock:
+            rollup = self._rollups.get(user_id)
+            if rollup is not None:
+                self._rollups.move_to_end(user_id)
+        conn = self.conn
+        # Version and rows must come from one snapshot, or a concurrent write
+        # could end up counted twice once its patch is applied
+        outer = conn.in_transaction
+        if not outer:
+            conn.execute('BEGIN')
+        try:
+            version = self.data_version(user_id)
+            if rollup is not None and rollup.version == version:
+                return rollup
+            rows = conn.execute(
+                'SELECT day, category_code, total, count FROM expense_daily_totals WHERE user_id = ?',
+                (user_id,),
+            ).fetchall()
+        finally:
+            if not outer:
+                conn.execute('COMMIT')
+        rollup = DailyRollup.build(
+            version,
+            [(row['day'], row['category_code'], row['total'], row['count']) for row in rows],
+            date.today().toordinal(),
+        )
+        with self._rollups_lock:
+            current = self._rollups.get(user_id)
+            if current is None or current.version <= version:
+                self._rollups[user_id] = rollup
+                self._rollups.move_to_end(user_id)
+                while len(self._rollups) > ROLLUP_CACHE_USERS:
+                    self._rollups.popitem(last=False)
+        return rollup
+
+    def range_totals(self, user_id, start=None, end=None):
+        """Return (total, count, {category: total}) for current expenses dated within [start, end].
+
+        Bounds are inclusive YYYY-MM-DD strings, or None for open-ended.
+        Raises ValueError if a bound is malformed.
+        """
+        start_day = None if start is None else encode_day(start)
+        end_day = None if end is None else encode_day(end)
+        rollup = self._rollup(user_id)
+        with self._rollups_lock:
+            total, count, by_code = rollup.totals(start_day, end_day)
+        category_totals = {
+            self._category_name(code): decode_amount(float(round(amount, 2)))
+            for code, amount in by_code.items()
+        }
+        totals = (decode_amount(float(round(total, 2))), count, category_totals)
+        if self.verify_totals:
+            clauses = ''.join([
+                '' if start_day is None else ' AND day >= :start',
+                '' if end_day is None else ' AND day <= :end',
+            ])
+            expected = _fold_totals([
+                dict(row, category=self._category_name(row['category_code']))
+                for row in self.conn.execute(
+                    'SELECT category_code, SUM(amount) AS total, COUNT(*) AS count '
+                    f'FROM expenses WHERE user_id = :user{clauses} GROUP BY category_code',
+                    {'user': user_id, 'start': start_day, 'end': end_day},
+                )
+            ])
+            if not _totals_match(totals, expected):
+                raise AggregateMismatch(
+                    f'Range totals for {user_id} between {start} and {end} are {totals}, expected {expected}'
+                )
+        return totals
+
+    def expense_totals(self, user_id):
+        """Return (total, count, {category: total}) for a user's current expenses"""
+        rows = self.conn.execute(
+            'SELECT category, total, count FROM expense_totals WHERE user_id = ?',
+            (user_id,),
+        ).fetchall()
+        totals = _fold_totals(rows)
+        if self.verify_totals:
+            expected = _fold_totals([
+                dict(row, category=self._category_name(row['category_code']))
+                for row in self.conn.execute(
+                    'SELECT category_code, SUM(amount) AS total, COUNT(*) AS count '
+                    'FROM expenses WHERE user_id = ? GROUP BY category_code',
+                    (user_id,),
+                )
+            ])
+            if not _totals_match(totals, expected):
+                raise AggregateMismatch(f'Running totals for {user_id} are {totals}, expected {expected}')
+        return totals
+
+    # Past month expenses
+
+    def list_past_expenses(self, user_id):
+        return self._columns(
+            f'SELECT {EXPENSE_COLUMNS} FROM past_expenses WHERE user_id = ? ORDER BY day',
+            (user_id,),
+        )
+
+    def has_past_expenses(self, user_id):
+        return self.conn.execute(
+            'SELECT 1 FROM past_expenses WHERE user_id = ? LIMIT 1', (user_id,)
+        ).fetchone() is not None
+
+    def replace_past_expenses(self, user_id, items):
+        rows = self._encode_expenses(user_id, items)
+        with self.transaction(user_id) as conn:
+            removed = conn.execute('DELETE FROM past_expenses WHERE user_id = ?', (user_id,)).rowcount
+            conn.executemany(
+                'INSERT INTO past_expenses (id, user_id, title, amount, category_code, day, description) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+            self._count_rows('past_expenses', len(rows) - removed)
+            self._bump_version(conn, user_id)
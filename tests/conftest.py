@@ -0,0 +1,58 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import Store  # noqa: E402
+
+CATEGORIES = ['Food & Dining', 'Transportation', 'Shopping', 'Other']
+
+
+def make_expense(title='Lunch', amount=100, category='Food & Dining', date='2024-03-10', description=''):
+    return {
+        'id': str(uuid.uuid4()),
+        'title': title,
+        'amount': amount,
+        'category': category,
+        'date': date,
+        'description': description,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A store on a fresh temporary database that checks every totals read against the rows"""
+    store = Store(str(tmp_path / 'test.db'), verify_totals=True, categories=CATEGORIES)
+    yield store
+    store.release()
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The app, imported against a temporary database with aggregate checks on"""
+    os.environ['EXPENSE_TRACKER_DB'] = str(tmp_path_factory.mktemp('app') / 'app.db')
+    os.environ['EXPENSE_TRACKER_VERIFY_AGGREGATES'] = '1'
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    """A test client logged in as a new user"""
+    user_id = str(uuid.uuid4())
+    app_module.store.create_user({
+        'id': user_id,
+        'email': f'{user_id}@example.com',
+        'password': 'password',
+        'name': 'Test User',
+        'monthly_budget': 30000,
+    })
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    client.user_id = user_id
+    return client
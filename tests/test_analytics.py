@@ -0,0 +1,46 @@
+import json
+import os
+import random
+
+import pytest
+
+from analytics import _summarize_python, summarize
+from conftest import CATEGORIES, ROOT, make_expense
+from rules import CompiledRules
+
+pytest.importorskip('numpy')
+from analytics import _summarize_numpy  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def rules():
+    with open(os.path.join(ROOT, 'savings_rules.json'), encoding='utf-8') as f:
+        return CompiledRules(json.load(f))
+
+
+def random_expenses(rng):
+    categories = CATEGORIES + ['Entertainment', 'Travel', 'Unlisted Category']
+    items = []
+    for _ in range(rng.randint(1, 300)):
+        amount = rng.randint(1, 20000) if rng.random() < 0.7 else round(rng.uniform(0.01, 5000), 2)
+        items.append(make_expense(
+            title=rng.choice(['Lunch', 'Taxi', 'Movie', 'Gadget']),
+            amount=amount,
+            category=rng.choice(categories),
+            date=f'2024-05-{rng.randint(1, 31):02d}',
+        ))
+    return items
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_engines_agree(store, rules, seed):
+    store.replace_past_expenses('user-1', random_expenses(random.Random(seed)))
+    past_data = store.list_past_expenses('user-1')
+    expected = json.dumps(_summarize_python(past_data, rules), sort_keys=True)
+    assert json.dumps(_summarize_numpy(past_data, rules), sort_keys=True) == expected
+    assert json.dumps(summarize(past_data, rules), sort_keys=True) == expected
+
+
+def test_empty_data(store, rules):
+    past_data = store.list_past_expenses('nobody')
+    assert summarize(past_data, rules) == _summarize_python(past_data, rules)
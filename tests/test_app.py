@@ -0,0 +1,61 @@
+import uuid
+
+from conftest import make_expense
+
+
+def expense_ids(client):
+    return {expense['id'] for expense in client.get('/api/expenses').get_json()}
+
+
+def test_batch_is_all_or_nothing(client, app_module):
+    store = app_module.store
+    kept = make_expense(amount=50)
+    store.add_expense(client.user_id, kept)
+
+    response = client.post('/api/expenses/batch', json={
+        'create': [{'title': 'Taxi', 'amount': 30, 'category': 'Transportation', 'date': '2024-05-01'}],
+        'delete': [kept['id'], str(uuid.uuid4())],
+    })
+    assert response.status_code == 404
+    assert expense_ids(client) == {kept['id']}
+    assert store.expense_totals(client.user_id) == (50, 1, {'Food & Dining': 50})
+
+    response = client.post('/api/expenses/batch', json={
+        'create': [{'title': 'Taxi', 'amount': 30, 'category': 'Transportation', 'date': '2024-05-01'}],
+        'delete': [kept['id']],
+    })
+    assert response.status_code == 200
+    created = response.get_json()['create'][0]['expense']
+    assert expense_ids(client) == {created['id']}
+    assert store.expense_totals(client.user_id) == (30, 1, {'Transportation': 30})
+    assert store.range_totals(client.user_id, '2024-05-01', '2024-05-01')[:2] == (30, 1)
+
+
+def test_import_skips_invalid_rows(client, app_module):
+    body = '\n'.join([
+        'title,amount,category,date',
+        'Lunch,120,Food & Dining,2024-03-01',
+        'Bad amount,nan,Food & Dining,2024-03-02',
+        'Bad date,10,Food & Dining,2024-3-2',
+        'Far future,10,Food & Dining,2999-01-01',
+        'Bus,45.5,Transportation,2024-03-03',
+    ])
+    response = client.post('/api/expenses/import?format=csv', data=body.encode())
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['imported'], result['failed']) == (2, 3)
+    assert [error['line'] for error in result['errors']] == [3, 4, 5]
+    assert app_module.store.expense_totals(client.user_id) == (165.5, 2, {
+        'Food & Dining': 120, 'Transportation': 45.5,
+    })
+
+
+def test_import_keeps_rows_before_a_parse_error(client, app_module):
+    body = b'{"title": "Lunch", "amount": 12, "category": "Food & Dining"}\nnot json\n'
+    response = client.post('/api/expenses/import?format=ndjson', data=body)
+    assert response.status_code == 200
+    assert response.get_json()['failed'] == 1
+
+    response = client.post('/api/expenses/import?format=csv', data=b'title,category\nLunch,Food & Dining\n')
+    assert response.status_code == 400
+    assert app_module.store.expense_totals(client.user_id)[:2] == (12, 1)
@@ -0,0 +1,196 @@
+import sqlite3
+import uuid
+
+import pytest
+
+import storage
+from conftest import make_expense
+from storage import MIGRATIONS, Store
+
+USER = 'user-1'
+
+
+def add_user(store, user_id=USER, email=None):
+    return store.create_user({
+        'id': user_id,
+        'email': email or f'{user_id}@example.com',
+        'password': 'password',
+        'name': 'Test User',
+        'monthly_budget': 30000,
+    })
+
+
+def test_create_user_reports_only_duplicates(store):
+    assert add_user(store)
+    assert not add_user(store, 'user-2', email=f'{USER}@example.com')
+    assert not add_user(store, USER, email='other@example.com')
+    with pytest.raises(sqlite3.IntegrityError):
+        store.create_user({'id': 'user-3', 'email': 'x@example.com', 'password': None,
+                           'name': None, 'monthly_budget': 1})
+
+
+def test_totals_follow_adds_and_deletes(store):
+    add_user(store)
+    items = [
+        make_expense(amount=120.5, date='2024-03-01'),
+        make_expense(amount=80, category='Transportation', date='2024-03-05'),
+        make_expense(amount=40, date='2024-04-02'),
+        make_expense(amount=15.25, category='Shiny New Category', date='2024-04-20'),
+    ]
+    store.add_expenses(USER, items)
+    assert store.expense_totals(USER) == (255.75, 4, {
+        'Food & Dining': 160.5, 'Transportation': 80, 'Shiny New Category': 15.25,
+    })
+
+    assert store.delete_expenses(USER, [items[0]['id'], str(uuid.uuid4()), 'not-an-id']) == [
+        ('Food & Dining', 120.5), None, None,
+    ]
+    assert store.delete_expense(USER, items[0]['id']) is None
+    assert store.expense_totals(USER) == (135.25, 3, {
+        'Food & Dining': 40, 'Transportation': 80, 'Shiny New Category': 15.25,
+    })
+    assert store.count_expenses(USER) == 3
+    assert store.sizes()['expenses'] == 3
+
+
+def test_range_totals_are_inclusive_and_patched_after_writes(store):
+    add_user(store)
+    store.add_expenses(USER, [
+        make_expense(amount=10, date='2024-01-31'),
+        make_expense(amount=20, date='2024-02-01'),
+        make_expense(amount=30, category='Shopping', date='2024-02-29'),
+        make_expense(amount=40, date='2024-03-01'),
+    ])
+    assert store.range_totals(USER, '2024-02-01', '2024-02-29') == (
+        50, 2, {'Food & Dining': 20, 'Shopping': 30},
+    )
+    assert store.range_totals(USER)[:2] == (100, 4)
+
+    # The rollup built above is patched in place by these writes
+    late = make_expense(amount=5, category='Other', date='2024-02-15')
+    store.add_expense(USER, late)
+    store.add_expense(USER, make_expense(amount=7, date='2030-06-01'))
+    assert store.range_totals(USER, '2024-02-01', '2024-02-29')[:2] == (55, 3)
+    store.delete_expense(USER, late['id'])
+    assert store.range_totals(USER, start='2024-02-02') == (77, 3, {'Shopping': 30, 'Food & Dining': 47})
+    assert store.range_totals(USER, end='2023-12-31') == (0, 0, {})
+
+
+def test_failed_transaction_leaves_nothing_behind(store):
+    add_user(store)
+    store.add_expense(USER, make_expense(amount=10))
+    version = store.data_version(USER)
+    with pytest.raises(RuntimeError):
+        with store.transaction(USER):
+            store.add_expense(USER, make_expense(amount=99, category='Never Committed'))
+            store.delete_expense(USER, store.list_expenses(USER)[0]['id'])
+            raise RuntimeError('abort')
+    assert store.expense_totals(USER) == (10, 1, {'Food & Dining': 10})
+    assert store.range_totals(USER)[:2] == (10, 1)
+    assert store.data_version(USER) == version
+    assert store.sizes()['expenses'] == 1
+    assert 'Never Committed' not in store._category_codes
+
+
+def test_nested_transaction_needs_the_writer_lock(store):
+    other = next(
+        f'user-{i}' for i in range(1000)
+        if store._user_locks_for([f'user-{i}']) != store._user_locks_for([USER])
+    )
+    with store.transaction(USER):
+        with pytest.raises(RuntimeError):
+            with store.transaction(other):
+                pass
+    with store.transaction(USER, other):
+        store.add_expense(other, make_expense())
+    assert store.expense_totals(other)[1] == 1
+
+
+def test_search_matches_prefixes_newest_first(store):
+    add_user(store)
+    store.add_expenses(USER, [
+        make_expense(title='Café latte', date='2024-01-01'),
+        make_expense(title='Cafe crème', description='with friends', date='2024-02-01'),
+        make_expense(title='Taxi home', category='Transportation', date='2024-03-01'),
+    ])
+    assert [e['title'] for e in store.search_expenses(USER, 'cafe', 10)] == ['Cafe crème', 'Café latte']
+    assert [e['title'] for e in store.search_expenses(USER, 'CRE fri', 10)] == ['Cafe crème']
+    assert [e['title'] for e in store.search_expenses(USER, 'ta', 10)] == ['Taxi home']
+    assert len(store.search_expenses(USER, 'nothing', 10)) == 0
+
+
+@pytest.mark.parametrize('max_terms', [3, 400])
+def test_broad_search_prefix_finds_every_match(store, monkeypatch, max_terms):
+    monkeypatch.setattr(storage, 'SEARCH_SORT_LIMIT', 5)
+    monkeypatch.setattr(storage, 'MAX_SEARCH_TERMS', max_terms)
+    add_user(store)
+    store.add_expenses(USER, [
+        make_expense(title=f'a{letter}', date=f'2024-01-{day:02d}')
+        for day, letter in enumerate('bcdefghij', 1)
+    ])
+    store.add_expense(USER, make_expense(title='azzz newest', date='2024-06-01'))
+    found = store.search_expenses(USER, 'a', 20)
+    assert len(found) == 10
+    assert found[0]['title'] == 'azzz newest'
+    assert [e['date'] for e in found] == sorted((e['date'] for e in found), reverse=True)
+
+    page = store.search_expenses(USER, 'a', 4)
+    rest = store.search_expenses(USER, 'a', 20, after=(page[3]['date'], page[3]['id']))
+    assert [e['id'] for e in page] + [e['id'] for e in rest] == [e['id'] for e in found]
+
+
+def test_query_expenses_filters_and_pages(store):
+    add_user(store)
+    store.add_expenses(USER, [
+        make_expense(amount=amount, category=category, date=f'2024-0{month}-10')
+        for month in range(1, 7)
+        for category, amount in [('Shopping', 100 * month), ('Food & Dining', 10 * month)]
+    ])
+    found = store.query_expenses(USER, 10, categories=['Shopping'], min_amount=200, max_amount=500,
+                                 start='2024-03-01')
+    assert [(e['date'], e['amount']) for e in found] == [
+        ('2024-05-10', 500), ('2024-04-10', 400), ('2024-03-10', 300),
+    ]
+    first = store.query_expenses(USER, 2, min_amount=30)
+    rest = store.query_expenses(USER, 10, min_amount=30, after=(first[1]['date'], first[1]['id']))
+    assert len(first) + len(rest) == 10
+    assert len(store.query_expenses(USER, 10, categories=['Unknown'])) == 0
+
+
+def test_migrates_legacy_rows(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(MIGRATIONS[0])
+    conn.execute('PRAGMA user_version = 1')
+    conn.execute("INSERT INTO users VALUES (?, 'legacy@example.com', 'password', 'Legacy', 30000)", (USER,))
+    legacy = [
+        ('Groceries', 250, 'Food & Dining', '2024-03-10'),
+        ('Bus pass', 60.5, 'Transportation', '2024-3-5'),  # unpadded, once accepted
+        ('Mystery', 999, 'Other', 'someday'),  # unreadable, dropped
+        ('Old hobby', 40, 'Hobbies', '2024-04-01'),  # category outside the defaults
+    ]
+    conn.executemany(
+        'INSERT INTO expenses VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(str(uuid.uuid4()), USER, title, amount, category, date, '') for title, amount, category, date in legacy],
+    )
+    conn.execute(
+        'INSERT INTO past_expenses VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (str(uuid.uuid4()), USER, 'Rent', 1000, 'Bills & Utilities', '2024-02-01', ''),
+    )
+    conn.commit()
+    conn.close()
+
+    store = Store(path, verify_totals=True)
+    assert store.sizes() == {'users': 1, 'expenses': 3, 'past_expenses': 1}
+    assert store.get_user_by_id(USER)['email'] == 'legacy@example.com'
+    assert store.expense_totals(USER) == (350.5, 3, {
+        'Food & Dining': 250, 'Transportation': 60.5, 'Hobbies': 40,
+    })
+    assert store.range_totals(USER, '2024-03-01', '2024-03-31')[:2] == (310.5, 2)
+    assert [e['date'] for e in store.list_expenses(USER)] == ['2024-03-05', '2024-03-10', '2024-04-01']
+    assert [e['title'] for e in store.search_expenses(USER, 'bus', 10)] == ['Bus pass']
+    assert [e['title'] for e in store.list_past_expenses(USER)] == ['Rent']
+
+    store.add_expense(USER, make_expense(amount=9.5, category='Hobbies'))
+    assert store.expense_totals(USER)[:2] == (360, 4)
+    store.release()